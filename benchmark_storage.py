@@ -0,0 +1,187 @@
+import argparse
+import json
+import logging
+import os
+import time
+from uuid import uuid4
+from utilities import logger
+from utilities.blob_service import BlobService
+from utilities.local_storage import LocalBlobContainer
+from db_models.cosmos_db_service import CosmosDBService, DEFAULT_MAX_CONCURRENCY, DEFAULT_PAGE_SIZE
+from db_models.ig_document import IGDocument
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Replays an IG load, cleanup and promotion against in-process Cosmos and Blob stand-ins"
+    )
+    parser.add_argument("-r", "--recording", help="Crawl recorded with load_ig.py --record. Synthetic documents are generated if omitted")
+    parser.add_argument("-n", "--documents", help="Number of synthetic documents", type=int, default=1000)
+    parser.add_argument("-lt", "--latency", help="Simulated seconds of latency per request", type=float, default=0.005)
+    parser.add_argument("-tp", "--throughput", help="Simulated provisioned RU/s. Requests above it are throttled", type=float)
+    parser.add_argument("-w", "--workers", help="Maximum number of concurrent requests", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("-ps", "--page_size", help="Query page size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("-o", "--output", help="File to write the benchmark results to as json")
+    parser.add_argument(
+        "-l",
+        "--log_level",
+        help="Minimum log level",
+        default="info",
+        choices=["debug", "info", "error"],
+    )
+    return parser.parse_args()
+
+
+def load_recording(path: str) -> [dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_records(count: int, standard: str = "tig", version: str = "1-0", html_size: int = 4096) -> [dict]:
+    """
+    Generates IG document records shaped like a crawl of a page tree with ten children per page.
+    """
+    records = []
+    for i in range(count):
+        record = {
+            "id": str(uuid4()),
+            "standard": standard,
+            "version": version,
+            "pageId": str(i),
+            "pageVersion": 1,
+            "title": f"Page {i}",
+            "html": f"<p>{'x' * html_size}</p>",
+            "text": "x" * (html_size // 2),
+            "createdAt": "2020-01-01T00:00:00",
+            "updatedAt": "2020-01-01T00:00:00",
+            "children": [],
+            "childrenTitles": []
+        }
+        if i:
+            parent = records[(i - 1) // 10]
+            record["parent"] = parent["id"]
+            record["parentDocumentTitle"] = parent["title"]
+            parent["children"].append(record["id"])
+            parent["childrenTitles"].append(record["title"])
+        records.append(record)
+    return records
+
+
+def run_benchmark(
+    records: [dict],
+    latency: float = 0.0,
+    throughput: float = None,
+    workers: int = DEFAULT_MAX_CONCURRENCY,
+    page_size: int = DEFAULT_PAGE_SIZE
+) -> [dict]:
+    """
+    Runs the storage steps of load_ig.py and promote_documents.py against fresh local stand-ins.
+
+    Returns:
+    The elapsed seconds, requests, throttled requests and request charge of every step
+    """
+    connection_string = f"UseLocalStorage=true;Latency={latency};Throughput={throughput or ''};Run={uuid4()}"
+    os.environ["COSMOSDB_CONNECTION_STRING_DEV"] = connection_string
+    os.environ["COSMOSDB_DATABASE_NAME_DEV"] = "benchmark"
+    os.environ["COSMOSDB_IG_DOCS_TABLE_NAME_DEV"] = "igdocs"
+    source_db = CosmosDBService.get_instance(connection_string, "benchmark", "igdocs")
+    target_db = CosmosDBService.get_instance(connection_string, "benchmark", "igdocs_target")
+    containers = [
+        source_db._container,
+        target_db._container,
+        LocalBlobContainer.from_connection_string(connection_string, "images"),
+        LocalBlobContainer.from_connection_string(connection_string, "generated-json"),
+    ]
+    results = []
+
+    def measure(step: str, operation):
+        for container in containers:
+            container.reset_stats()
+        start = time.perf_counter()
+        error = None
+        try:
+            operation()
+        except Exception as e:
+            error = str(e)
+            logger.error(f"{step} failed: {e}")
+        result = {
+            "step": step,
+            "error": error,
+            "seconds": time.perf_counter() - start,
+            "requests": sum(container.stats["requests"] for container in containers),
+            "throttled": sum(container.stats["throttled"] for container in containers),
+            "requestCharge": sum(container.stats["requestCharge"] for container in containers),
+        }
+        logger.info(
+            f"{step}: {result['seconds']:.2f}s, {result['requests']} requests, "
+            f"{result['throttled']} throttled, {result['requestCharge']:.2f} RU"
+        )
+        results.append(result)
+
+    def build_documents(source_records: [dict]) -> [IGDocument]:
+        documents = []
+        for record in source_records:
+            document = IGDocument(record)
+            document.children = record.get("children", [])
+            document.children_titles = record.get("childrenTitles", [])
+            documents.append(document)
+        return documents
+
+    standard_versions = {(record["standard"], record["version"]) for record in records}
+    kept_records = records[:len(records) - len(records) // 10]
+
+    def load_page_indexes():
+        for standard, version in standard_versions:
+            IGDocument.load_page_index(standard, version)
+            IGDocument.clear_page_index(standard, version)
+
+    def cleanup():
+        for standard, version in standard_versions:
+            IGDocument.delete_except({
+                "standard": standard,
+                "version": version,
+                "page_ids": {record["pageId"] for record in kept_records if record["standard"] == standard and record["version"] == version}
+            })
+
+    def update_source():
+        changed_records = [{**record, "updatedAt": "2021-01-01T00:00:00"} for record in kept_records[::20]]
+        IGDocument.bulk_save(build_documents(changed_records), db_service=source_db, max_concurrency=workers)
+
+    def upload_images():
+        image = os.urandom(20 * 1024)
+        BlobService("images", max_concurrency=workers).upload_many(
+            [(f"{record['pageId']}-image.png", image, {"source_version": "1"}) for record in records[::10]]
+        )
+
+    def publish_document():
+        BlobService("generated-json").upload_json({"documents": records}, "benchmark.json", compact=True, compress=True)
+
+    os.environ["AZURE_CONNECTION_STRING"] = connection_string
+    measure("load", lambda: IGDocument.bulk_save(build_documents(records), db_service=source_db, max_concurrency=workers))
+    measure("page index", load_page_indexes)
+    measure("cleanup", cleanup)
+    measure("promote (replace)", lambda: CosmosDBService.replace_all(
+        source_db, target_db, max_concurrency=workers, page_size=page_size
+    ))
+    measure("update", update_source)
+    measure("promote (diff)", lambda: CosmosDBService.sync_all(
+        source_db, target_db, max_concurrency=workers, page_size=page_size
+    ))
+    measure("image upload", upload_images)
+    measure("json publish", publish_document)
+    return results
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    log_levels = {"info": logging.INFO, "debug": logging.DEBUG, "error": logging.ERROR}
+    logger.setLevel(log_levels.get(args.log_level, logging.INFO))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)-5.5s]  %(message)s"))
+    logger.addHandler(console_handler)
+    records = load_recording(args.recording) if args.recording else generate_records(args.documents)
+    logger.info(f"Benchmarking {len(records)} documents")
+    results = run_benchmark(records, args.latency, args.throughput, args.workers, args.page_size)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
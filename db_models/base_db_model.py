@@ -2,7 +2,7 @@ from uuid import uuid4
 from datetime import datetime
 from db_models.cosmos_db_service import CosmosDBService
 from abc import abstractmethod
-from typing import List
+from typing import Iterator
 
 class BaseDBModel:
 
@@ -49,9 +49,9 @@ class BaseDBModel:
     @classmethod
     def query_by_params(
         cls, partition_key: str = None, query_params: dict = None, db_service=None
-    ) -> list:
+    ) -> Iterator["BaseDBModel"]:
         """
-        Gets a list of records from the DB.
+        Lazily gets records from the DB.
         If no params are passed, all records will be returned.
         If partition_key is passed -> it will be added to the query.
         query_params param can be used to filter records.
@@ -63,10 +63,10 @@ class BaseDBModel:
             cls._database_name(),
             cls._table_name(),
         )
-        db_records: List[dict] = db_service.query_items(
+        db_records: Iterator[dict] = db_service.query_items(
             partition_key=partition_key, query_params=query_params
         )
-        return [cls(db_record) for db_record in db_records]
+        return (cls(db_record) for db_record in db_records)
 
     @classmethod
     def delete(
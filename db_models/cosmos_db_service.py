@@ -1,13 +1,25 @@
+import json
 import logging
-from typing import Callable, Optional, List, Dict, Any, Union
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Optional, List, Dict, Any, Union, Iterable, Iterator
 
 from azure.core.paging import ItemPaged
 from azure.cosmos import CosmosClient, DatabaseProxy, ContainerProxy
 from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
     CosmosResourceExistsError,
     CosmosResourceNotFoundError,
 )
 from logging import getLogger, Logger
+from utilities.local_storage import LocalCosmosContainer, is_local_connection_string, parse_connection_string
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_PAGE_SIZE = 100
 
 
 class CosmosDBService:
@@ -25,6 +37,8 @@ class CosmosDBService:
         instance._logger = getLogger("cosmos-db-service")
 
         instance._connection_string = connection_string
+        if is_local_connection_string(connection_string):
+            return cls._get_local_instance(instance, database_name, table_name)
         instance._cosmos_client = cls._cosmos_client_instance_map.get(connection_string)
         if instance._cosmos_client is None:
             instance._cosmos_client = CosmosClient.from_connection_string(
@@ -58,6 +72,21 @@ class CosmosDBService:
             return instance
         return existing_instance
 
+    @classmethod
+    def _get_local_instance(cls, instance: "CosmosDBService", database_name: str, table_name: str):
+        """
+        Returns a service backed by an in-process LocalCosmosContainer, used for offline benchmarks and tests.
+        """
+        instance._database_name = database_name
+        instance._container_name = table_name
+        key = (instance._connection_string, database_name, table_name)
+        existing_instance = cls._table_name_instance_map.get(key)
+        if existing_instance is None:
+            instance._container = LocalCosmosContainer.from_connection_string(instance._connection_string)
+            cls._table_name_instance_map[key] = instance
+            return instance
+        return existing_instance
+
     def __init__(self):
         self._connection_string: str = None
         self._cosmos_client: CosmosClient = None
@@ -66,6 +95,8 @@ class CosmosDBService:
         self._container_name: str = None
         self._container: ContainerProxy = None
         self._container_alias: str = "C"
+        self._partition_key_name: str = "id"
+        self._query_cache: Dict[tuple, str] = {}
         self._logger: Logger = None
 
     def save_item(self, item_to_save: dict):
@@ -125,12 +156,50 @@ class CosmosDBService:
         transformation: Callable[
             [Dict[str, Any]], Dict[str, Any]
         ] = _identity_transformation,
-    ):
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        checkpoint_file: str = None,
+    ) -> Dict[str, Any]:
         """
         Copies all items from one CosmosDB table to another.
+        Source items are streamed page by page and every page is upserted to the target concurrently.
+        If checkpoint_file is passed, the continuation token of the last fully copied page is stored in it
+        with the source and target tables, and a failed copy between the same tables resumes from that page
+        when it is run again.
+        Returns the number of copied and failed items, the total request charge and the throughput.
         """
-        for item in source_db_service._container.read_all_items():
-            target_db_service._container.create_item(body=transformation(item))
+        logger = target_db_service._logger
+        checkpoint_tables = {
+            "source": source_db_service._get_checkpoint_name(),
+            "target": target_db_service._get_checkpoint_name(),
+        }
+        continuation_token = CosmosDBService._read_checkpoint(checkpoint_file, checkpoint_tables, logger)
+        if continuation_token:
+            logger.info(f"Resuming copy from checkpoint {checkpoint_file}")
+        stats = {"copied": 0, "failed": 0, "requestCharge": 0.0}
+        start = time.perf_counter()
+        pages = source_db_service._container.read_all_items(max_item_count=page_size).by_page(continuation_token)
+        for page in pages:
+            page_stats = target_db_service.bulk_upsert(
+                (transformation(item) for item in page), max_concurrency=max_concurrency
+            )
+            stats["copied"] += page_stats["upserted"]
+            stats["failed"] += page_stats["failed"]
+            stats["requestCharge"] += page_stats["requestCharge"]
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f'Copied {stats["copied"]} items to CosmosDB container "{target_db_service._container_name}" '
+                f'({stats["copied"] / elapsed if elapsed else 0:.1f} items/s)'
+            )
+            if page_stats["failed"]:
+                raise Exception(
+                    f'Failed to copy {page_stats["failed"]} items to CosmosDB container "{target_db_service._container_name}"'
+                )
+            CosmosDBService._write_checkpoint(checkpoint_file, checkpoint_tables, pages.continuation_token)
+        CosmosDBService._remove_checkpoint(checkpoint_file)
+        stats["elapsedSeconds"] = time.perf_counter() - start
+        stats["itemsPerSecond"] = stats["copied"] / stats["elapsedSeconds"] if stats["elapsedSeconds"] else 0
+        return stats
 
     @staticmethod
     def replace_all(
@@ -140,38 +209,213 @@ class CosmosDBService:
         transformation: Callable[
             [Dict[str, Any]], Dict[str, Any]
         ] = _identity_transformation,
-    ):
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        checkpoint_file: str = None,
+    ) -> Dict[str, Any]:
         """
-        Deletes all items from target db and copies all items from source CosmosDB table to target.
+        Replaces all items of the target CosmosDB table with the items of the source table.
+        Source items are upserted first and target items missing from the source are deleted afterwards,
+        so the target is never empty during the replacement.
+        Returns the copy stats with the number of deleted items.
         """
-        target_db_service.delete_all(partition_key)
-        CosmosDBService.copy_all(source_db_service, target_db_service, transformation)
+        stats = CosmosDBService.copy_all(
+            source_db_service,
+            target_db_service,
+            transformation,
+            max_concurrency=max_concurrency,
+            page_size=page_size,
+            checkpoint_file=checkpoint_file,
+        )
+        source_ids = {item["id"] for item in source_db_service.query_items(fields=["id"], page_size=page_size)}
+        fields = list(dict.fromkeys(["id", partition_key]))
+        stale_items = (
+            (item["id"], item.get(partition_key))
+            for item in target_db_service.query_items(fields=fields, page_size=page_size)
+            if item["id"] not in source_ids
+        )
+        delete_stats = target_db_service.bulk_delete(stale_items, max_concurrency=max_concurrency)
+        stats["deleted"] = delete_stats["deleted"]
+        stats["failed"] += delete_stats["failed"]
+        stats["requestCharge"] += delete_stats["requestCharge"]
+        return stats
+
+    @staticmethod
+    def sync_all(
+        source_db_service: "CosmosDBService",
+        target_db_service: "CosmosDBService",
+        partition_key: str = "id",
+        transformation: Callable[
+            [Dict[str, Any]], Dict[str, Any]
+        ] = _identity_transformation,
+        version_field: str = "updatedAt",
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Dict[str, Any]:
+        """
+        Makes the target CosmosDB table match the source table by only writing the differences.
+        Both tables are compared with projected queries on id and version_field. Source items that are
+        missing from the target or have a different version are read, transformed and upserted to the target.
+        Target items missing from the source are deleted.
+        Returns the number of copied, deleted, unchanged and failed items and the total request charge.
+        """
+        fields = list(dict.fromkeys(["id", partition_key, version_field]))
+        target_items = {
+            item["id"]: (item.get(version_field), item.get(partition_key))
+            for item in target_db_service.query_items(fields=fields, page_size=page_size)
+        }
+        changed_items = []
+        unchanged = 0
+        for item in source_db_service.query_items(fields=fields, page_size=page_size):
+            version = item.get(version_field)
+            target_item = target_items.pop(item["id"], None)
+            if target_item and version is not None and target_item[0] == version:
+                unchanged += 1
+            else:
+                changed_items.append((item["id"], item.get(partition_key)))
+        target_db_service._logger.info(
+            f"{len(changed_items)} changed, {len(target_items)} removed and {unchanged} unchanged items found"
+        )
+
+        def copy_item(item: tuple, hook: Callable):
+            item_id, item_partition_key = item
+            source_item = source_db_service._container.read_item(
+                item=item_id, partition_key=item_partition_key, response_hook=hook
+            )
+            target_db_service._container.upsert_item(body=transformation(source_item), response_hook=hook)
+
+        start = time.perf_counter()
+        copied, copy_failed, copy_charge = target_db_service._run_bulk(
+            changed_items, copy_item, "copy", max_concurrency, DEFAULT_MAX_RETRIES
+        )
+        delete_stats = target_db_service.bulk_delete(
+            [(item_id, item_partition_key) for item_id, (_, item_partition_key) in target_items.items()],
+            max_concurrency=max_concurrency,
+        )
+        return {
+            "copied": copied,
+            "deleted": delete_stats["deleted"],
+            "unchanged": unchanged,
+            "failed": copy_failed + delete_stats["failed"],
+            "requestCharge": copy_charge + delete_stats["requestCharge"],
+            "elapsedSeconds": time.perf_counter() - start,
+        }
+
+    def _get_checkpoint_name(self) -> str:
+        """
+        Returns the account endpoint, database and container of the service, without the account key.
+        """
+        account_endpoint = parse_connection_string(self._connection_string).get("AccountEndpoint", "")
+        return f"{account_endpoint}/{self._database_name}/{self._container_name}"
+
+    @staticmethod
+    def _read_checkpoint(checkpoint_file: str, checkpoint_tables: Dict[str, str], logger: Logger) -> Optional[str]:
+        """
+        Returns the continuation token stored in checkpoint_file, or None if there is no checkpoint
+        or it was written by a copy between other tables.
+        """
+        if not checkpoint_file or not os.path.exists(checkpoint_file):
+            return None
+        try:
+            with open(checkpoint_file, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            logger.warning(f"Ignoring unreadable checkpoint {checkpoint_file}")
+            return None
+        if any(checkpoint.get(key) != name for key, name in checkpoint_tables.items()):
+            logger.warning(
+                f'Ignoring checkpoint {checkpoint_file} of a copy from "{checkpoint.get("source")}" to "{checkpoint.get("target")}"'
+            )
+            return None
+        return checkpoint.get("continuationToken")
+
+    @staticmethod
+    def _write_checkpoint(checkpoint_file: str, checkpoint_tables: Dict[str, str], continuation_token: Optional[str]):
+        if checkpoint_file and continuation_token:
+            with open(checkpoint_file, "w", encoding="utf-8") as f:
+                json.dump({**checkpoint_tables, "continuationToken": continuation_token}, f)
+
+    @staticmethod
+    def _remove_checkpoint(checkpoint_file: str):
+        if checkpoint_file and os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
 
     def query_items(
-        self, partition_key: str = None, query_params: dict = None
-    ) -> List[dict]:
+        self,
+        partition_key: str = None,
+        query_params: dict = None,
+        fields: List[str] = None,
+        page_size: int = None,
+    ) -> Iterator[dict]:
         """
         Queries items with a given partition key or/and parameters.
         If no params are passed, all records will be returned.
-        If partition_key is passed -> it will be added to the query.
-        If query_params are passed, the query will also have a WHERE statement like:
-        "SELECT * FROM Transactions C WHERE C.studyId='CDISC01' AND C.dataBundleId='test'"
+        If partition_key is passed -> the query will only target that partition.
+        If query_params contain the partition key field the query will also only target that partition.
+        If query_params are passed, the query will also have a parameterized WHERE statement like:
+        "SELECT * FROM Transactions C WHERE C.studyId=@p0 AND C.dataBundleId=@p1"
+        If fields are passed, only those fields are returned:
+        "SELECT C.id, C.studyId FROM Transactions C"
+        Items are returned lazily, fetching page_size items per request.
         """
+        query_params = query_params if isinstance(query_params, dict) else {}
+        partition_key = partition_key or query_params.get(self._partition_key_name)
         search_params: dict = {
-            "query": f"SELECT * FROM {self._container_name} {self._container_alias}",
-            "enable_cross_partition_query": True,
+            "query": self._get_query_text(fields, query_params),
+            "parameters": [
+                {"name": f"@p{i}", "value": value}
+                for i, value in enumerate(value for value in query_params.values() if value is not None)
+            ],
         }
         if partition_key:
             search_params["partition_key"] = partition_key
-        if query_params and isinstance(query_params, dict):
-            search_params["query"] += f" {self._create_where_statement(query_params)}"
+        else:
+            search_params["enable_cross_partition_query"] = True
+        if page_size:
+            search_params["max_item_count"] = page_size
         self._logger.info(
             f'Querying items from CosmosDB container "{self._container_name}". search_params={search_params}'
         )
+        return self._iterate_query(search_params)
+
+    def _get_query_text(self, fields: List[str], query_params: dict) -> str:
+        """
+        Returns the query text for a projection and a set of query params.
+        Query texts only depend on the keys of the params so they are built once per key set.
+        """
+        cache_key = (
+            tuple(fields or []),
+            tuple((key, value is None) for key, value in query_params.items()),
+        )
+        query = self._query_cache.get(cache_key)
+        if query is None:
+            query = f"SELECT {self._create_select_statement(fields)} FROM {self._container_name} {self._container_alias}"
+            if query_params:
+                query += f" {self._create_where_statement(query_params)}"
+            self._query_cache[cache_key] = query
+        return query
+
+    def _iterate_query(self, search_params: dict) -> Iterator[dict]:
         items_iterator: ItemPaged = self._container.query_items(**search_params)
-        items: List[dict] = list(items_iterator)
-        self._logger.info(f"items={items}")
-        return items
+        count: int = 0
+        request_charge: float = 0.0
+        try:
+            for page in items_iterator.by_page():
+                request_charge += self._get_last_request_charge()
+                for item in page:
+                    count += 1
+                    yield item
+        finally:
+            self._logger.info(
+                f'Queried {count} items from CosmosDB container "{self._container_name}". request_charge={request_charge:.2f}'
+            )
+
+    def _get_last_request_charge(self) -> float:
+        try:
+            headers = self._container.client_connection.last_response_headers
+            return float(headers.get("x-ms-request-charge", 0))
+        except (AttributeError, TypeError, ValueError):
+            return 0.0
 
     def update_item(self, item_to_update: dict):
         """
@@ -181,13 +425,140 @@ class CosmosDBService:
         logging.info(f"updating item. update_body={item_to_update}")
         self._container.upsert_item(body=item_to_update)
 
+    def bulk_upsert(
+        self,
+        items: Iterable[Dict[str, Any]],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> Dict[str, Any]:
+        """
+        Upserts items into CosmosDb container (table) concurrently.
+        Items are sent in batches of concurrent requests. Throttled (429) requests are retried
+        after the delay requested by CosmosDB, up to max_retries times.
+        Returns the number of upserted and failed items and the total request charge.
+        """
+        succeeded, failed, request_charge = self._run_bulk(
+            items,
+            lambda item, hook: self._container.upsert_item(body=item, response_hook=hook),
+            "upsert",
+            max_concurrency,
+            max_retries,
+        )
+        return {"upserted": succeeded, "failed": failed, "requestCharge": request_charge}
+
+    def bulk_delete(
+        self,
+        item_ids: Iterable[Union[str, tuple]],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> Dict[str, Any]:
+        """
+        Deletes items from CosmosDb container (table) concurrently.
+        Items are given as ids, or as (id, partition_key) tuples when the partition key is not the id.
+        Items that no longer exist are counted as deleted.
+        Returns the number of deleted and failed items and the total request charge.
+        """
+        succeeded, failed, request_charge = self._run_bulk(
+            item_ids,
+            lambda item_id, hook: self._delete_if_exists(item_id, hook),
+            "delete",
+            max_concurrency,
+            max_retries,
+        )
+        return {"deleted": succeeded, "failed": failed, "requestCharge": request_charge}
+
+    def _delete_if_exists(self, item_id: Union[str, tuple], response_hook: Callable):
+        item_id, partition_key = item_id if isinstance(item_id, tuple) else (item_id, item_id)
+        try:
+            self._container.delete_item(
+                item=item_id, partition_key=partition_key, response_hook=response_hook
+            )
+        except CosmosResourceNotFoundError:
+            pass
+
+    def _run_bulk(
+        self,
+        items: Iterable[Any],
+        operation: Callable[[Any, Callable], Any],
+        operation_name: str,
+        max_concurrency: int,
+        max_retries: int,
+    ) -> tuple:
+        """
+        Runs an operation for every item in batches of concurrent requests.
+        Returns the number of succeeded and failed operations and the total request charge.
+        """
+        stats = {"succeeded": 0, "failed": 0, "requestCharge": 0.0}
+        stats_lock = threading.Lock()
+
+        def run(item: Any):
+            charge = self._with_throttling_retry(
+                lambda hook: operation(item, hook),
+                max_retries,
+            )
+            with stats_lock:
+                if charge is None:
+                    stats["failed"] += 1
+                    item_id = item.get("id") if isinstance(item, dict) else item
+                    self._logger.error(f'Failed to {operation_name} item {item_id} in CosmosDB container "{self._container_name}"')
+                else:
+                    stats["succeeded"] += 1
+                    stats["requestCharge"] += charge
+
+        start = time.perf_counter()
+        items_iterator = iter(items)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            while True:
+                batch = list(islice(items_iterator, max_concurrency * 4))
+                if not batch:
+                    break
+                list(executor.map(run, batch))
+        elapsed = time.perf_counter() - start
+        self._logger.info(
+            f'Bulk {operation_name} of {stats["succeeded"]} items in CosmosDB container "{self._container_name}" took {elapsed:.2f}s. '
+            f'failed={stats["failed"]} request_charge={stats["requestCharge"]:.2f}'
+        )
+        return stats["succeeded"], stats["failed"], stats["requestCharge"]
+
+    def _with_throttling_retry(self, operation: Callable, max_retries: int) -> Optional[float]:
+        """
+        Runs a container operation, retrying it when CosmosDB throttles the request.
+        The operation is passed a response hook used to sum the request charges of its requests.
+        Returns the request charge of the operation or None if it failed.
+        """
+        charge = {"value": 0.0}
+
+        def hook(headers, _):
+            charge["value"] += float(headers.get("x-ms-request-charge", 0) or 0)
+
+        for attempt in range(max_retries + 1):
+            try:
+                operation(hook)
+                return charge["value"]
+            except CosmosHttpResponseError as e:
+                if e.status_code != 429 or attempt == max_retries:
+                    self._logger.error(e)
+                    return None
+                retry_after_ms = (e.headers or {}).get("x-ms-retry-after-ms")
+                delay = float(retry_after_ms) / 1000 if retry_after_ms else 0.1 * (2 ** attempt)
+                self._logger.info(f"Request throttled by CosmosDB, retrying in {delay:.2f}s")
+                time.sleep(delay)
+        return None
+
+    def _create_select_statement(self, fields: List[str] = None) -> str:
+        if not fields:
+            return "*"
+        return ", ".join(f"{self._container_alias}.{field}" for field in fields)
+
     def _create_where_statement(self, query_params: dict) -> str:
         conditions: List[str] = []
+        parameter_index: int = 0
         for key, value in query_params.items():
             if value is None:
                 condition: str = f"NOT IS_DEFINED({self._container_alias}.{key})"
             else:
-                condition: str = f"{self._container_alias}.{key}='{value}'"
+                condition: str = f"{self._container_alias}.{key}=@p{parameter_index}"
+                parameter_index += 1
             conditions.append(condition)
         condition_string: str = " AND ".join(conditions)
         return f"WHERE {condition_string}"
@@ -1,9 +1,19 @@
 from db_models.base_db_model import BaseDBModel
+from db_models.cosmos_db_service import CosmosDBService, DEFAULT_MAX_CONCURRENCY
 from datetime import datetime
+from typing import List
 import os
 
 class IGDocument(BaseDBModel):
 
+    # Fields loaded into the page index, enough to resolve existing documents and detect unchanged pages
+    INDEX_FIELDS = [
+        "id", "pageId", "pageVersion", "createdAt", "title", "parent", "parentDocumentTitle",
+        "section", "structures", "useCase", "standardSubtype", "children", "childrenTitles"
+    ]
+    # Page indexes keyed by (standard, version), each mapping page id to a projected record
+    _page_indexes = {}
+
     def __init__(self, params: dict):
         super(IGDocument, self).__init__(params)
         self.standard = params["standard"]
@@ -11,8 +21,9 @@ class IGDocument(BaseDBModel):
         self.standard_subtype = params.get("standardSubtype")
         self.title = params["title"]
         self.page_id = params["pageId"]
-        self.html = params["html"]
-        self.text = params["text"]
+        self.page_version = params.get("pageVersion")
+        self.html = params.get("html")
+        self.text = params.get("text")
         self.parent_document = params.get("parent")
         self.parent_document_title = params.get("parentDocumentTitle")
         self.section = params.get("section")
@@ -48,6 +59,17 @@ class IGDocument(BaseDBModel):
 
     @classmethod
     def get_or_create(cls, record_params={}) -> "IGDocument":
+        page_index = cls._page_indexes.get((record_params.get("standard"), record_params.get("version")))
+        if page_index is not None:
+            existing_record = page_index.get(record_params.get("pageId"))
+            if existing_record:
+                return cls({
+                    **record_params,
+                    "id": existing_record["id"],
+                    "createdAt": existing_record.get("createdAt")
+                })
+            return cls(record_params)
+
         document = next(iter(cls.query_by_params(
             query_params={
                 "standard": record_params.get("standard"),
@@ -66,29 +88,85 @@ class IGDocument(BaseDBModel):
             document.parent_document_title = record_params.get("parentDocumentTitle")
             document.section = record_params.get("section")
             document.structures = record_params.get("structures")
+            document.use_case = record_params.get("useCase")
+            document.page_version = record_params.get("pageVersion")
             return document
         else:
             return cls(record_params)
 
     @classmethod
-    def delete_except(cls, record_params={}):
-        documents = cls.query_by_params(
+    def bulk_save(cls, documents: List["IGDocument"], db_service=None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> dict:
+        """
+        Saves a list of documents to the DB with concurrent upserts.
+        """
+        db_service = db_service or cls._get_db_service()
+        for document in documents:
+            document._ensure_valid_record_structure()
+        return db_service.bulk_upsert(
+            (document._to_db_dict() for document in documents), max_concurrency=max_concurrency
+        )
+
+    @classmethod
+    def load_page_index(cls, standard: str, version: str) -> dict:
+        """
+        Loads the stored documents of a standard version with one projected query.
+        Until the index is cleared get_or_create resolves documents of that standard version against it
+        instead of querying the DB for every page.
+
+        Returns:
+        The projected records keyed by page id
+        """
+        db_service = cls._get_db_service()
+        records = db_service.query_items(
+            query_params={
+                "standard": standard,
+                "version": version
+            },
+            fields=cls.INDEX_FIELDS
+        )
+        page_index = {record["pageId"]: record for record in records}
+        cls._page_indexes[(standard, version)] = page_index
+        return page_index
+
+    @classmethod
+    def clear_page_index(cls, standard: str, version: str):
+        cls._page_indexes.pop((standard, version), None)
+
+    @classmethod
+    def delete_except(cls, record_params={}) -> dict:
+        """
+        Deletes the documents of a standard version whose page ids are not in record_params["page_ids"].
+        Only ids and page ids are queried and the stale documents are deleted concurrently.
+        """
+        db_service = cls._get_db_service()
+        page_ids = record_params.get("page_ids")
+        records = db_service.query_items(
             query_params={
                 "standard": record_params.get("standard"),
                 "version": record_params.get("version")
-            }
+            },
+            fields=["id", "pageId"]
+        )
+        return db_service.bulk_delete(
+            record["id"] for record in records if record["pageId"] not in page_ids
         )
-        for document in documents:
-            if document.page_id not in record_params.get("page_ids"):
-                cls.delete(id=document.id)
 
     @classmethod
-    def delete_where(cls, query_params={}):
-        documents = cls.query_by_params(
-            query_params=query_params
+    def delete_where(cls, query_params={}) -> dict:
+        """
+        Deletes the documents matching query_params. Only ids are queried and the documents are deleted concurrently.
+        """
+        db_service = cls._get_db_service()
+        records = db_service.query_items(query_params=query_params, fields=["id"])
+        return db_service.bulk_delete(record["id"] for record in records)
+
+    @classmethod
+    def _get_db_service(cls) -> CosmosDBService:
+        return CosmosDBService.get_instance(
+            cls._connection_string(),
+            cls._database_name(),
+            cls._table_name(),
         )
-        for document in documents:
-            cls.delete(id=document.id)
 
     def _ensure_valid_record_structure(self):
         assert self.title and isinstance(self.title, str)
@@ -132,4 +210,6 @@ class IGDocument(BaseDBModel):
             data["structures"] = self.structures
         if self.use_case:
             data["useCase"] = self.use_case
+        if self.page_version is not None:
+            data["pageVersion"] = self.page_version
         return data
@@ -1,7 +1,8 @@
+import json
 import logging
 from typing import List
 from utilities.wiki_client import WikiClient
-from utilities.wiki_document_parser import Parser
+from utilities.wiki_document_parser import Parser, DEFAULT_MAX_WORKERS
 from db_models.ig_document import IGDocument
 import argparse
 from dotenv import load_dotenv
@@ -20,6 +21,9 @@ def parse_arguments():
     parser.add_argument("-v", "--version")
     parser.add_argument("-o", "--output", help="Name of the file to write data to. Defaults to assumptions.json", default="data.json")
     parser.add_argument("-r", "--report_file", help="File containing document generation report", default="report.txt")
+    parser.add_argument("-i", "--incremental", help="Include this flag to only parse and save pages that changed since the last load", action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of wiki pages processed concurrently", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("-rc", "--record", help="File to record the crawled documents to, for replay by benchmark_storage.py")
     args = parser.parse_args()
     return args
 
@@ -52,11 +56,20 @@ if __name__ == "__main__":
         logger.error("Missing required password. Password must be provided as an argument or defined in the environment variable `CONFLUENCE_PASSWORD`")
         exit(1)
     client = WikiClient(username, password)
-    parser = Parser(client, logger=logger)
-    documents: List[IGDocument] = parser.get_ig_document_tree(args.target_url, args.standard, args.version)
+    parser = Parser(client, logger=logger, max_workers=args.workers)
+    documents: List[IGDocument] = parser.get_ig_document_tree(args.target_url, args.standard, args.version, incremental=args.incremental)
     logger.info(f"{len(documents)} documents found.")
-    for document in documents.values():
-        document._save_to_db()
+    changed_documents = [document for document in documents.values() if document.id not in parser.unchanged_document_ids]
+    if args.record:
+        # Unchanged documents of an incremental load have no html or text, so only changed documents are recorded
+        with open(args.record, "w", encoding="utf-8") as f:
+            json.dump([document._to_db_dict() for document in changed_documents], f)
+        logger.info(f"Recorded {len(changed_documents)} documents to {args.record}")
+    save_stats = IGDocument.bulk_save(changed_documents)
+    logger.info(f"{save_stats['upserted']} documents saved, {save_stats['failed']} failed. Request charge: {save_stats['requestCharge']:.2f} RU")
+    if save_stats["failed"]:
+        logger.error(f"Failed to save {save_stats['failed']} documents. Stale documents are not deleted")
+        exit(1)
     standard_version_to_pageids = reduce(accumulate_pageids, documents.values(), defaultdict(set))
     docs_params = [
         {
@@ -68,4 +81,7 @@ if __name__ == "__main__":
         in standard_version_to_pageids.items()
     ]
     for doc_params in docs_params:
-        IGDocument.delete_except(doc_params)
+        delete_stats = IGDocument.delete_except(doc_params)
+        logger.info(f"{delete_stats['deleted']} stale {doc_params['standard']} {doc_params['version']} documents deleted, {delete_stats['failed']} failed. Request charge: {delete_stats['requestCharge']:.2f} RU")
+    metrics = client.get_request_metrics()
+    logger.info(f"{metrics['requests']} wiki requests made. Average latency {metrics['averageSeconds']:.3f}s, max latency {metrics['maxSeconds']:.3f}s")
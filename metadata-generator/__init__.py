@@ -9,6 +9,10 @@ from utilities.config import Config
 from utilities import logger
 import utilities.constants as constants
 from utilities.blob_service import BlobService
+from utilities.response_cache import ResponseCache
+
+# Created once per worker so warm invocations reuse the blob container client and its connections
+blob_service = BlobService("generated-json")
 
 def main(config: dict) -> str:
     # setup logging
@@ -23,12 +27,13 @@ def main(config: dict) -> str:
     password = os.environ.get(constants.CONFLUENCE_PASSWORD)
     api_key = os.environ.get(constants.LIBRARY_API_KEY)
 
-    blob_service = BlobService("generated-json")
     # generate json
     Config.validate_config_data(config)
     config = Config(config)
     config.add(constants.IGNORE_ERRORS, True) # Ignores spec grabber errors by default
-    factory = ProductFactory(username, password, api_key, **{})
+    factory = ProductFactory(username, password, api_key, **{
+        'library_cache': ResponseCache.build_from_environment()
+    })
     product = factory.build_product(config)
     product_document = product.generate_document()
     product.validate_document(product_document)
@@ -36,5 +41,10 @@ def main(config: dict) -> str:
     blob_service.upload_json(
         product_document=product_document,
         blob_name=file_name,
+        compact=_is_enabled(constants.GENERATED_JSON_COMPACT),
+        compress=_is_enabled(constants.GENERATED_JSON_GZIP),
     )
     return file_name
+
+def _is_enabled(environment_variable: str) -> bool:
+    return os.environ.get(environment_variable, "").lower() in ["1", "true", "yes"]
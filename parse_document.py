@@ -1,8 +1,10 @@
 import os
 import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from product_types.product_factory import ProductFactory
 from utilities.config import Config
+from utilities.response_cache import ResponseCache
 from utilities import logger
 import utilities.constants as constants
 
@@ -33,9 +35,29 @@ def parse_arguments():
     parser.add_argument("-i", "--ignore_errors", help="Include this flag if you'd like to ignore spec grabber errors", action="store_true")
     parser.add_argument("-o", "--output", help="Specifies output file")
     parser.add_argument("-od", "--output_directory", help="Directory to store output files")
+    parser.add_argument("-cd", "--cache_directory", help="Directory for the persistent library response cache (Can also be stored in the environment variable LIBRARY_CACHE_DIRECTORY)")
+    parser.add_argument("-ct", "--cache_ttl", help="Seconds before a cached library response expires", type=int)
+    parser.add_argument("-cm", "--cache_max_size", help="Maximum size of the library response cache in bytes", type=int)
+    parser.add_argument("--offline", help="Include this flag to only serve library responses from the cache", action="store_true")
+    parser.add_argument("-j", "--jobs", help="Number of integrated standard sub-products generated concurrently", type=int, default=1)
     args = parser.parse_args()
     return args
 
+def generate_sub_product(factory: ProductFactory, product, entry: dict, args):
+    """
+    Builds, validates and writes the sub-product of an integrated standard directory entry.
+    """
+    product_config = Config(product.generate_config(entry))
+    product_config.add(constants.IGNORE_ERRORS, args.ignore_errors)
+    sub_product = factory.build_product(product_config)
+    logger.info(f"Generating {sub_product.summary['name']}")
+    sub_product.add_integrated_standard_link(product.build_self_link())
+    sub_document = sub_product.generate_document()
+    sub_product.validate_document(sub_document)
+    sub_product.write_document(sub_document, args.output, args.output_directory)
+    logger.info(f"Finished generating {sub_product.summary['name']}")
+    return sub_product
+
 if __name__ == "__main__":
     args = parse_arguments()
     username = args.username or os.environ.get(constants.CONFLUENCE_USERNAME)
@@ -59,23 +81,28 @@ if __name__ == "__main__":
         config = Config({})
     
     config.add(constants.IGNORE_ERRORS, args.ignore_errors)
+    library_cache = ResponseCache.build_from_environment(args.cache_directory, args.cache_ttl, args.cache_max_size, args.offline)
+    if args.offline and not library_cache:
+        logger.error("Offline mode requires a library cache directory. Provide it as an argument or define the environment variable `LIBRARY_CACHE_DIRECTORY`")
+        exit(1)
     arguments = {
-        'spec_grabber_doc': args.spec_grabber_doc
+        'spec_grabber_doc': args.spec_grabber_doc,
+        'library_cache': library_cache
     }
     factory = ProductFactory(username, password, api_key, **arguments)
     product = factory.build_product(config)
     if product.product_category == "integrated":
         document_id = config.get(constants.SUMMARY)
         directory = product._get_directory(document_id)
-        for entry in directory["list"]["entry"]:
-            product_config = Config(product.generate_config(entry))
-            product_config.add(constants.IGNORE_ERRORS, args.ignore_errors)
-            sub_product = factory.build_product(product_config)
-            sub_product.add_integrated_standard_link(product.build_self_link())
-            sub_document = sub_product.generate_document()
-            sub_product.validate_document(sub_document)
-            sub_product.write_document(sub_document, args.output, args.output_directory)
+        entries = directory["list"]["entry"]
+        # Sub-products only share the factory's clients, so they are generated independently
+        # and added to the integrated standard in directory order once they are all done
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            sub_products = list(executor.map(lambda entry: generate_sub_product(factory, product, entry, args), entries))
+        for sub_product in sub_products:
             product.add_standard(sub_product)
     product_document = product.generate_document()
     product.validate_document(product_document)
     product.write_document(product_document, args.output, args.output_directory)
+    metrics = factory.wiki_client.get_request_metrics()
+    logger.info(f"{metrics['requests']} wiki requests made. Average latency {metrics['averageSeconds']:.3f}s, max latency {metrics['maxSeconds']:.3f}s")
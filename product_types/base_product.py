@@ -9,6 +9,8 @@ from utilities.transformer import Transformer
 from utilities import logger
 import utilities.constants as constants
 from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from utilities.library_client import DEFAULT_MAX_WORKERS
 
 class BaseProduct:
     def __init__(self, wiki_client, library_client, summary, product_type, version, product_subtype, config = None):
@@ -26,6 +28,9 @@ class BaseProduct:
         self.version_prefix = self._get_version_prefix(version)
         self.has_parent_model = self.summary.get("parentModel")
         self.codelist_mapping = {}
+        # Prior releases of the product, newest first, and prior version links keyed by the version independent part of the href
+        self._prior_versions = None
+        self._prior_version_links = {}
         self.class_name_mappings = {
             'All Classes-General': "General Observations",
             "Interventions-General": "Interventions",
@@ -104,34 +109,91 @@ class BaseProduct:
             return None
 
     def _get_all_prior_versions(self) -> [dict]:
-        """ returns all versions of a product returned by the /mdr/products CDISC library endpoint. """
+        """ returns all prior versions of a product returned by the /mdr/products CDISC library endpoint, newest first. """
+        if self._prior_versions is None:
+            self._prior_versions = self._load_prior_versions()
+        return self._prior_versions
+
+    def _load_prior_versions(self) -> [dict]:
         try:
             data = self.library_client.get_api_json("/mdr/products")
             if self.model_type == "adam":
                 versions = data["_links"][self.product_category]["_links"].get("adam", [])
             else:
                 versions = data["_links"][self.product_category]["_links"].get(self.product_type, [])
-            return [version for version in versions if \
-                        self._get_version_number(version["href"].split("/")[3]) < self.version_number and \
+            version_key = self._get_version_key(self.version_number)
+            prior_versions = [version for version in versions if \
+                        self._get_version_key(self._get_version_number(version["href"].split("/")[3])) < version_key and \
                             self._get_version_prefix(version["href"].split("/")[3]) == self.version_prefix ]
+            return sorted(
+                prior_versions,
+                key=lambda version: self._get_version_key(self._get_version_number(version["href"].split("/")[3])),
+                reverse=True
+            )
         except Exception as e:
             logger.error(e)
             return []
-        return []
 
+    @staticmethod
+    def _get_version_key(version_number: str) -> tuple:
+        """ Returns a key ordering version numbers like 3-1-2 or 1-1 semantically. """
+        return tuple(int(number) for number in re.findall(r"\d+", version_number or ""))
 
     def _get_prior_version(self, link: dict) -> dict:
-        prior_versions = self._get_all_prior_versions()
-        data_link = '/'.join(link["href"].split('/')[4:])
-        # Sort prior versions
-        sorted_versions = sorted(prior_versions, key=lambda version: version["href"].split("/")[3])
-        for version in reversed(sorted_versions):
-            try:
-                return self.library_client.get_api_json(version["href"] + "/" + data_link)["_links"]["self"]
-            except:
-                pass
-        return None
-    
+        data_link = self._get_data_link(link)
+        if data_link not in self._prior_version_links:
+            self.prefetch_prior_versions([link])
+        return self._prior_version_links.get(data_link)
+
+    def prefetch_prior_versions(self, links: [dict], max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Resolves the prior version links of a batch of links.
+        Prior releases are probed newest first, one release at a time, concurrently for every link
+        that has not been found in a newer release yet. Links without any prior version are memoized too.
+        """
+        pending = [
+            data_link for data_link in dict.fromkeys(self._get_data_link(link) for link in links if link)
+            if data_link not in self._prior_version_links
+        ]
+        if not pending:
+            return
+        requests_made = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for version in self._get_all_prior_versions():
+                if not pending:
+                    break
+                hrefs = [version["href"] + "/" + data_link for data_link in pending]
+                requests_made = requests_made + len(hrefs)
+                results = list(executor.map(self._probe_prior_version, hrefs))
+                for data_link, result in zip(pending, results):
+                    if result:
+                        self._prior_version_links[data_link] = result
+                pending = [data_link for data_link in pending if data_link not in self._prior_version_links]
+        for data_link in pending:
+            self._prior_version_links[data_link] = None
+        logger.debug(f"Resolved prior versions of {len(links)} links with {requests_made} requests")
+
+    def _probe_prior_version(self, href: str) -> dict:
+        try:
+            return self.library_client.get_api_json(href)["_links"]["self"]
+        except Exception:
+            return None
+
+    @staticmethod
+    def _get_data_link(link: dict) -> str:
+        return '/'.join(link["href"].split('/')[4:])
+
+    def set_prior_versions(self, items: list):
+        """
+        Sets the prior version link for a batch of variables or other items with a set_prior_version method.
+        Root items and prior version links are resolved concurrently before the prior versions are set.
+        """
+        root_hrefs = [item.links["rootItem"]["href"] for item in items if item.links.get("rootItem")]
+        self.library_client.prefetch_api_json(root_hrefs)
+        self.prefetch_prior_versions([item.links["self"] for item in items if not item.links.get("rootItem") and item.links.get("self")])
+        for item in items:
+            item.set_prior_version()
+
     def write_document(self, document: dict, output_file: str = None, output_directory: str = None):
         if not output_file:
             output_file = self.summary["name"].replace(" ", "") + ".json"
@@ -173,26 +235,31 @@ class BaseProduct:
                     errors.append(error.text)
         return errors
 
-    def _validate_links(self, obj: dict):
+    def _validate_document_links(self, objects: [dict], max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Validates the library links of every object in a document.
+        Each unique href is checked once and the checks run concurrently. A link that does not
+        resolve is reported for every object referencing it.
+        """
         keys_to_validate = ["priorVersion", "model", "modelClassVariable", "codelist",  \
             "sdtmClassMappingTargets", "sdtmigDatasetMappingTargets"]
-        if obj.get("_links"):
-            for key, link in obj.get("_links").items():
-                if key in keys_to_validate:
-                    if isinstance(link, dict):
-                        try:
-                            self.library_client.get_api_json(link["href"])
-                        except Exception as e:
-                            logger.error(f"Get request failed for link: {link['href']}")
-                    elif isinstance(link, list):
-                        for l in link:
-                            try:
-                                self.library_client.get_api_json(l["href"])
-                            except:
-                                logger.error(f"Get request failed for link: {l['href']}")
-                        
-        else:
-            logger.error(f"object with name {obj['name']} has no links")
+        references = {}
+        for obj in objects:
+            if not obj.get("_links"):
+                logger.error(f"object with name {obj['name']} has no links")
+                continue
+            for key, link in obj["_links"].items():
+                if key not in keys_to_validate:
+                    continue
+                links = link if isinstance(link, list) else [link] if isinstance(link, dict) else []
+                for l in links:
+                    references.setdefault(l["href"], []).append(obj)
+        logger.info(f"Checking {len(references)} unique links referenced by {len(objects)} objects")
+        failed_hrefs = self.library_client.check_api_links(list(references), max_workers)
+        for href, referencing_objects in references.items():
+            if href in failed_hrefs:
+                for obj in referencing_objects:
+                    logger.error(f"Get request failed for link: {href} referenced by {obj.get('name')}")
 
     def _get_codelist_mapping(self) -> dict:
         codelist_json = self.library_client.get_api_json("/mdr/ct/packages")
@@ -203,23 +270,23 @@ class BaseProduct:
             "adamct": self._get_latest_codelist_with_type("adam", packages),
             "cdashct": self._get_latest_codelist_with_type("cdash", packages)
         }
-        codelist_mapping = {
-            "sendct": {},
-            "sdtmct": {},
-            "adamct": {},
-            "cdashct": {}
+        # The latest packages are loaded concurrently
+        with ThreadPoolExecutor(max_workers=len(package_types)) as executor:
+            mappings = list(executor.map(self._load_codelist_mapping, package_types.items()))
+        return {
+            package_type: mapping
+            for package_type, mapping in zip(package_types.keys(), mappings)
         }
-        for package_type, latest_package in package_types.items():
-            logger.debug(f"Building map of submissionValue -> concept id for {package_type} using latest package {latest_package}")
-            try:
-                codelist_spec = self.library_client.get_api_json(latest_package)
-                for codelist in codelist_spec["codelists"]:
-                    codelist_mapping[package_type][codelist["submissionValue"]] = codelist["conceptId"]
-            except:
-                logger.error(f"Unable to find latest codelist for package type {package_type} with link {latest_package}")
-                continue
-        return codelist_mapping
-    
+
+    def _load_codelist_mapping(self, package: (str, str)) -> dict:
+        package_type, latest_package = package
+        logger.debug(f"Building map of submissionValue -> concept id for {package_type} using latest package {latest_package}")
+        try:
+            return self.library_client.get_codelist_mapping(latest_package)
+        except:
+            logger.error(f"Unable to find latest codelist for package type {package_type} with link {latest_package}")
+            return {}
+
     def _get_codelist_links(self, codelist_submission_values: [str]) -> [dict]:
         codelists = []
         for value in codelist_submission_values:
@@ -18,6 +18,10 @@ class BaseVariable:
     
     def set_prior_version(self) -> dict:
         root_link = self.links.get("rootItem")
+        if root_link and root_link["href"] in self.parent_product.library_client.failed_hrefs:
+            # The root item was already requested and not found, e.g. for a variable new in this version
+            logger.error(f"No prior version found for variable: {self.to_string()}")
+            return
         try:
             root_data = self.parent_product.library_client.get_api_json(root_link["href"])
             versions = root_data["_links"]["versions"]
@@ -58,6 +58,7 @@ class ADAMIG(ADAM):
                     parent_varset.add_variable(variable_copy)
 
         # Assign variable sets to appropriate data structures
+        linked_items = []
         for varset in varsets:
             parent_datastructure = self._find_datastructure(
                 varset.parent_datastructure_name, datastructures
@@ -65,9 +66,12 @@ class ADAMIG(ADAM):
             if parent_datastructure:
                 varset.set_parent_datastructure(parent_datastructure)
                 parent_datastructure.add_varset(varset)
+                linked_items.append(varset)
                 for variable in varset.variables:
                     variable.set_parent_datastructure(parent_datastructure)
                     variable.set_parent_varset(varset)
+                    linked_items.append(variable)
+        self.set_prior_versions(linked_items)
         
         # Add parent class links
         self._add_parent_class_datastructure_links(datastructures)
@@ -78,8 +82,9 @@ class ADAMIG(ADAM):
         datastructures = []
         document_id = self.config.get(constants.DATASTRUCTURES)
         data = self.wiki_client.get_wiki_table(document_id, constants.DATASTRUCTURES)
-        for record in data["list"]["entry"]:
-            datastructure = Datastructure(record["fields"], self)
+        datastructure_objs = [Datastructure(record["fields"], self) for record in data["list"]["entry"]]
+        self.prefetch_prior_versions([datastructure.links["self"] for datastructure in datastructure_objs])
+        for datastructure in datastructure_objs:
             prior_version = self._get_prior_version(datastructure.links["self"])
             if prior_version:
                 datastructure.add_link("priorVersion", prior_version)
@@ -115,13 +120,13 @@ class ADAMIG(ADAM):
     
     def validate_document(self, document: dict):
         logger.info("Begin validating document")
-        self._validate_links(document)
+        objects = [document]
         for datastructure in document["dataStructures"]:
-            self._validate_links(datastructure)
+            objects.append(datastructure)
             for varset in datastructure.get("analysisVariableSet", []):
-                self._validate_links(varset)
-                for variable in varset.get("analysisVariables", []):
-                    self._validate_links(variable)
+                objects.append(varset)
+                objects.extend(varset.get("analysisVariables", []))
+        self._validate_document_links(objects)
         logger.info("Finished validating document")
 
     def _build_variable(self, variable_data: dict) -> dict:
@@ -58,6 +58,8 @@ class Variable(BaseVariable):
         self.parent_datastructure_name = self.parent_datastructure.name
         self.add_link("parentDatastructure", datastructure.links.get("self"))
         self.add_link("self", self._build_self_link())
+
+    def set_prior_version(self):
         prior_version = self.parent_product._get_prior_version(self.links["self"])
         if prior_version:
             self.add_link("priorVersion", prior_version)
@@ -37,10 +37,12 @@ class Varset:
         self.label = f'{self.parent_datastructure_name} {self.source_label}'
         self.add_link("parentDatastructure", datastructure.links.get("self"))
         self.add_link("self", self._build_self_link())
+        self.validate()
+
+    def set_prior_version(self):
         prior_version = self.parent_product._get_prior_version(self.links["self"])
         if prior_version:
             self.add_link("priorVersion", prior_version)
-        self.validate()
 
     def add_variable(self, variable):
         self.variables.append(variable)
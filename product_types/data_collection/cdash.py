@@ -54,20 +54,18 @@ class CDASH(BaseProduct):
 
     def validate_document(self, document: dict):
         logger.info("Begin validating")
-        for c in document["classes"]:
-            self._validate_links(c)
-        for d in document["domains"]:
-            self._validate_links(d)
+        self._validate_document_links(document["classes"] + document["domains"])
         logger.info("Finished validating")
     
     def get_classes(self) -> [dict]:
         document_id = self.config.get(constants.CLASSES)
         classes = []
         classes_data = self.wiki_client.get_wiki_table(document_id, constants.CLASSES)
+        class_objs = [DataCollectionClass(record["fields"], self) for record in classes_data["list"]["entry"]]
+        self.prefetch_prior_versions([class_obj.links["self"] for class_obj in class_objs])
         i = 0
-        for record in classes_data["list"]["entry"]:
+        for class_obj in class_objs:
             i = i+1
-            class_obj = DataCollectionClass(record["fields"], self)
             prior_version = self._get_prior_version(class_obj.links["self"])
             if prior_version:
                 class_obj.add_link("priorVersion", prior_version)
@@ -82,10 +80,11 @@ class CDASH(BaseProduct):
         document_id = self.config.get(constants.DOMAINS)
         domains = []
         domains_data = self.wiki_client.get_wiki_table(document_id, constants.DOMAINS)
+        domain_objs = [Domain(record["fields"], self) for record in domains_data["list"]["entry"]]
+        self.prefetch_prior_versions([domain.links["self"] for domain in domain_objs])
         i = 0
-        for record in domains_data["list"]["entry"]:
+        for domain in domain_objs:
             i = i+1
-            domain = Domain(record["fields"], self)
             prior_version = self._get_prior_version(domain.links["self"])
             if prior_version:
                 domain.add_link("priorVersion", prior_version)
@@ -120,9 +119,9 @@ class CDASH(BaseProduct):
                     variable.add_codelist_links(codelist_submission_values)
                     variable.add_codelist_submission_values(codelist_submission_values)
                 variable.build_mapping_target_links()
-                variable.set_prior_version()
                 variable.validate()
                 variables.append(variable)
+            self.set_prior_versions(variables)
             logger.info("Finished loading variables")
         return variables
     
@@ -22,15 +22,19 @@ class CDASHIG(CDASH):
         scenarios = self.get_scenarios()
         classes, domains, variables = self.get_metadata(scenarios)
     
+        scenario_variables = []
         for variable in variables:
             parent_domain = self._find_domain(variable.parent_domain_name, domains)
             if variable.parent_scenario:
                 new_variable = variable.copy()
                 new_variable.set_parent_scenario(variable.parent_scenario)
                 variable.parent_scenario.add_variable(new_variable)
+                scenario_variables.append(new_variable)
             elif parent_domain:
                 variable.set_parent_domain(parent_domain)
                 parent_domain.add_variable(variable)
+        # Scenario variables have new root items so their prior versions are resolved again
+        self.set_prior_versions(scenario_variables)
 
         for scenario in scenarios:
             parent_domain = self._find_domain(scenario.parent_domain_name, domains)
@@ -59,10 +63,11 @@ class CDASHIG(CDASH):
         scenarios = []
         expected_fields = set(["name", "ordinal", "parentClass", "parentDomain", "implementationOption"])
         scenarios_data = self.wiki_client.get_wiki_table(document_id, constants.SCENARIOS)
+        scenario_objs = [Scenario(record["fields"], self) for record in scenarios_data["list"]["entry"]]
+        self.prefetch_prior_versions([scenario.links["self"] for scenario in scenario_objs])
         i = 0
-        for record in scenarios_data["list"]["entry"]:
+        for scenario in scenario_objs:
             i = i+1
-            scenario = Scenario(record["fields"], self)
             prior_version = self._get_prior_version(scenario.links["self"])
             if prior_version:
                 scenario.add_link("priorVersion", prior_version)
@@ -79,16 +84,16 @@ class CDASHIG(CDASH):
 
     def validate_document(self, document: dict):
         logger.info("Begin validating")
+        objects = []
         for c in document["classes"]:
-            self._validate_links(c)
+            objects.append(c)
             for d in c.get("domains", []):
-                self._validate_links(d)
-                for field in d.get("fields", []):
-                    self._validate_links(field)
+                objects.append(d)
+                objects.extend(d.get("fields", []))
             for scenario in c.get("scenarios", []):
-                self._validate_links(scenario)
-                for field in scenario.get("fields", []):
-                    self._validate_links(field)
+                objects.append(scenario)
+                objects.extend(scenario.get("fields", []))
+        self._validate_document_links(objects)
         logger.info("Finished validating")
     
     def _cleanup_document(self, document: dict) -> dict:
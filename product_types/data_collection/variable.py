@@ -149,7 +149,6 @@ class Variable(BaseVariable):
             del self.links["priorVersion"]
         if "implements" in self.links:
             del self.links["implements"]
-        self.set_prior_version()
 
     def build_mapping_target_links(self):
         targets = [] if not self.mapping_targets else self.mapping_targets.split(";")
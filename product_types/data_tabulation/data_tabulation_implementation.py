@@ -22,13 +22,14 @@ class DataTabulationImplementation(SDTM):
     
     def validate_document(self, document: dict):
         logger.info("Begin validating document")
-        self._validate_links(document)
+        objects = [document]
         for c in document["classes"]:
             assert isinstance(c.get("ordinal"), str)
-            self._validate_links(c)
+            objects.append(c)
             for dataset in c.get("datasets", []):
                 assert isinstance(dataset.get("ordinal"), str)
-                self._validate_links(dataset)
+                objects.append(dataset)
+        self._validate_document_links(objects)
         logger.info("Finished validating document")
 
     def _cleanup_document(self, document: dict) -> dict:
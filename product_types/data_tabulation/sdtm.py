@@ -77,15 +77,14 @@ class SDTM(BaseProduct):
         """
         logger.info("Begin validating")
         for c in document["classes"]:
-            self._validate_links(c)
             assert isinstance(c.get("ordinal"), str)
         for d in document["datasets"]:
-            self._validate_links(d)
             assert isinstance(d.get("ordinal"), str)
             for variable in d.get("datasetVariables", []):
                 assert isinstance(variable.get("ordinal"), str)
                 if "parentClass" in variable["_links"]:
                     logger.error(f"Dataset variable found with parent class link: {variable.get('name')}, Parent Dataset: {variable['links'].get('parentDataset')}")
+        self._validate_document_links(document["classes"] + document["datasets"])
         logger.info("Finished validating")
     
     def get_classes(self) -> [dict]:
@@ -160,6 +159,7 @@ class SDTM(BaseProduct):
                 parent_class = self._find_class_by_name(parent_class_name, classes)
                 variable = variable = Variable(variable_data=row, parent_product=self, parent_class=parent_class, parent_dataset=parent_dataset)
                 BaseProduct.insert_by_ordinal(variables, variable)
+            self.set_prior_versions(variables)
             logger.info("Finished loading variables")
         return variables
 
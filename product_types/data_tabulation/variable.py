@@ -60,6 +60,7 @@ class Variable(BaseVariable):
         self.parent_class_name = parent_class.name
         self.parent_dataset_name = parent_dataset.name
         self._build_links()
+        self.set_prior_version()
         if json_data["_links"].get("codelist"):
             self.add_link("codelist", json_data["_links"].get("codelist"))
 
@@ -101,7 +102,6 @@ class Variable(BaseVariable):
             "self": self._build_self_link(),
             "rootItem": self._build_root_link()
         }
-        self.set_prior_version()
         if self.parent_product.is_ig:
             try:
                 self.build_model_dataset_variable_link()
@@ -18,6 +18,10 @@ class ProductFactory:
     def __init__(self, username, password, api_key, **args):
         self.wiki_client = WikiClient(username, password, args.pop('spec_grabber_doc',''))
         self.api_key = api_key
+        self.library_cache = args.pop('library_cache', None)
+        # Shared by every product built by the factory, so library responses such as /mdr/products,
+        # model documents and CT codelist mappings are fetched once per run
+        self.library_client = LibraryClient(self.api_key, self.library_cache)
         self.foundational_models = ["sdtm", "cdash", "adam"]
         self.transformer = Transformer()
     
@@ -95,18 +99,18 @@ class ProductFactory:
             version = f"{version.split('-', 1)[1]}"
             summary["version"] = version
         if product_type == "sdtm":
-            return SDTM(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return SDTM(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "sendig" or product_subtype == "send":
-            return SENDIG(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return SENDIG(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "sdtmig" or product_subtype == "sdtm":
-            return SDTMIG(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return SDTMIG(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "cdash":
-            return CDASH(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return CDASH(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "cdashig" or product_subtype == "cdash":
-            return CDASHIG(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return CDASHIG(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "adam":
-            return ADAM(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return ADAM(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type.startswith("adam") or product_subtype == "adam":
-            return ADAMIG(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return ADAMIG(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
         elif product_type == "integrated":
-            return Integrated(self.wiki_client, LibraryClient(self.api_key), summary, product_type, version, product_subtype, config)
+            return Integrated(self.wiki_client, self.library_client, summary, product_type, version, product_subtype, config)
@@ -1,7 +1,7 @@
 import logging
 import argparse
 from utilities import logger
-from db_models.cosmos_db_service import CosmosDBService
+from db_models.cosmos_db_service import CosmosDBService, DEFAULT_MAX_CONCURRENCY
 from typing import Dict, Any
 
 
@@ -56,6 +56,26 @@ def parse_arguments():
         default="info",
         choices=["debug", "info", "error"],
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        help="Maximum number of concurrent requests to the target database",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        help="replace copies every document, diff only writes documents that changed since the last promotion",
+        default="replace",
+        choices=["replace", "diff"],
+    )
+    parser.add_argument(
+        "-cp",
+        "--checkpoint_file",
+        help="File storing promotion progress in replace mode. An interrupted promotion between the same "
+        "tables resumes from it when rerun. No checkpoint is kept if omitted",
+    )
     parser.add_argument("-o", "--output", help="Specifies output file")
     parser.add_argument(
         "-od", "--output_directory", help="Directory to store output files"
@@ -84,10 +104,34 @@ if __name__ == "__main__":
         args.database_target,
         args.table_target,
     )
-    CosmosDBService.replace_all(
-        source_db,
-        target_db,
-        transformation=lambda item: _replace_blob(
-            item, args.blob_source, args.blob_target
-        ),
+    transformation = lambda item: _replace_blob(
+        item, args.blob_source, args.blob_target
     )
+    if args.mode == "diff":
+        stats = CosmosDBService.sync_all(
+            source_db,
+            target_db,
+            transformation=transformation,
+            max_concurrency=args.workers,
+        )
+        logger.info(
+            f"{stats['copied']} changed documents promoted, {stats['deleted']} removed documents deleted, "
+            f"{stats['unchanged']} unchanged, {stats['failed']} failed in {stats['elapsedSeconds']:.2f}s. "
+            f"Request charge: {stats['requestCharge']:.2f} RU"
+        )
+    else:
+        stats = CosmosDBService.replace_all(
+            source_db,
+            target_db,
+            transformation=transformation,
+            max_concurrency=args.workers,
+            checkpoint_file=args.checkpoint_file,
+        )
+        logger.info(
+            f"{stats['copied']} documents promoted, {stats['deleted']} stale documents deleted, {stats['failed']} failed "
+            f"in {stats['elapsedSeconds']:.2f}s ({stats['itemsPerSecond']:.1f} documents/s). "
+            f"Request charge: {stats['requestCharge']:.2f} RU"
+        )
+    if stats["failed"]:
+        logger.error(f"Promotion incomplete: {stats['failed']} documents failed to promote or delete")
+        exit(1)
@@ -383,6 +383,11 @@ product_list = {
 }
 
 
+def mock_codelist_mapping(href):
+    package = mock_products_payload(href)
+    return {codelist["submissionValue"]: codelist["conceptId"] for codelist in package["codelists"]}
+
+
 def mock_products_payload(href):
     if href == "/mdr/ct/packages":
         return package_list
@@ -6,6 +6,7 @@ from tests.conftest import (
     mock_library_client,
     mock_wiki_client,
     mock_products_payload,
+    mock_codelist_mapping,
     mock_classes_data,
     mock_cdash_summary,
 )
@@ -154,6 +155,7 @@ def test_get_variable_codelists(
     )
     mock_wiki_client.get_wiki_json.return_value = mock_variable_data
     mock_library_client.get_api_json.side_effect = mock_products_payload
+    mock_library_client.get_codelist_mapping.side_effect = mock_codelist_mapping
     cdash.codelist_mapping = cdash._get_codelist_mapping()
     variables = cdash.get_variables()
     assert len(variables) == 4
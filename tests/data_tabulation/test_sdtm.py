@@ -1,6 +1,8 @@
 import pytest
 from product_types.data_tabulation.sdtm import SDTM
 from product_types.data_tabulation.variable import Variable
+from product_types.base_variable import BaseVariable
+from utilities.library_client import LibraryClient
 from utilities.config import Config
 from utilities import constants
 from unittest.mock import patch
@@ -182,3 +184,90 @@ def test_get_qualifiesVariables_links(
     # var2 should not appear because, though it has the same parent dataset name, its class is in [Interventions, Events, and Findings]
     # none of the other variables should appear because they are not in the list of variables qualified
     assert len(variable.links.get("qualifiesVariables", [])) == 1
+
+
+def build_prior_version_sdtmig(mock_wiki_client, mock_library_client, mock_sdtm_summary, available_hrefs):
+    products = {"_links": {"data-tabulation": {"_links": {"sdtmig": [
+        {"href": f"/mdr/sdtmig/{version}"} for version in ["3-1-2", "3-10", "3-2", "3-4"]
+    ]}}}}
+
+    def get_api_json(href):
+        if href == "/mdr/products":
+            return products
+        if href in available_hrefs:
+            return {"_links": {"self": {"href": href}}}
+        raise Exception(f"{href} not found")
+
+    mock_library_client.get_api_json.side_effect = get_api_json
+    return SDTM(mock_wiki_client, mock_library_client, mock_sdtm_summary, "sdtmig", "3-4", None, Config({}))
+
+
+def test_get_all_prior_versions_orders_versions_semantically(
+    mock_wiki_client, mock_library_client, mock_sdtm_summary
+):
+    sdtmig = build_prior_version_sdtmig(mock_wiki_client, mock_library_client, mock_sdtm_summary, set())
+    prior_versions = sdtmig._get_all_prior_versions()
+    assert [version["href"] for version in prior_versions] == ["/mdr/sdtmig/3-2", "/mdr/sdtmig/3-1-2"]
+    sdtmig._get_all_prior_versions()
+    assert mock_library_client.get_api_json.call_count == 1
+
+
+def test_prefetch_prior_versions_probes_newest_release_first(
+    mock_wiki_client, mock_library_client, mock_sdtm_summary
+):
+    sdtmig = build_prior_version_sdtmig(mock_wiki_client, mock_library_client, mock_sdtm_summary, {
+        "/mdr/sdtmig/3-2/datasets/AE",
+        "/mdr/sdtmig/3-2/datasets/DM",
+        "/mdr/sdtmig/3-1-2/datasets/DM",
+        "/mdr/sdtmig/3-1-2/datasets/EX",
+    })
+    links = [{"href": f"/mdr/sdtmig/3-4/datasets/{name}"} for name in ["AE", "DM", "EX", "NEW"]]
+    sdtmig.prefetch_prior_versions(links)
+    assert sdtmig._get_prior_version(links[0]) == {"href": "/mdr/sdtmig/3-2/datasets/AE"}
+    assert sdtmig._get_prior_version(links[1]) == {"href": "/mdr/sdtmig/3-2/datasets/DM"}
+    assert sdtmig._get_prior_version(links[2]) == {"href": "/mdr/sdtmig/3-1-2/datasets/EX"}
+    assert sdtmig._get_prior_version(links[3]) is None
+    # 1 products request, 4 probes of 3-2 and 2 probes of 3-1-2. Missing links are not probed again.
+    assert mock_library_client.get_api_json.call_count == 7
+
+
+def test_validate_document_checks_each_link_once(mock_wiki_client, mock_library_client, mock_sdtm_summary):
+    sdtm = SDTM(mock_wiki_client, mock_library_client, mock_sdtm_summary, "sdtm", "2-0", None, Config({}))
+    mock_library_client.check_api_links.return_value = {"/mdr/sdtm/1-8"}
+    document = {
+        "classes": [
+            {"name": "Events", "ordinal": "1", "_links": {"priorVersion": {"href": "/mdr/sdtm/1-8"}}},
+            {"name": "Findings", "ordinal": "2", "_links": {"priorVersion": {"href": "/mdr/sdtm/1-8"}}},
+        ],
+        "datasets": [
+            {"name": "AE", "ordinal": "1", "_links": {
+                "priorVersion": {"href": "/mdr/sdtm/1-7"},
+                "parentClass": {"href": "/mdr/sdtm/2-0/classes/Events"},
+            }},
+        ],
+    }
+    with patch("product_types.base_product.logger") as logger:
+        sdtm.validate_document(document)
+    hrefs = mock_library_client.check_api_links.call_args.args[0]
+    assert sorted(hrefs) == ["/mdr/sdtm/1-7", "/mdr/sdtm/1-8"]
+    errors = [call.args[0] for call in logger.error.call_args_list]
+    assert errors == [
+        "Get request failed for link: /mdr/sdtm/1-8 referenced by Events",
+        "Get request failed for link: /mdr/sdtm/1-8 referenced by Findings",
+    ]
+
+
+def test_set_prior_versions_does_not_refetch_missing_root_items(mock_wiki_client, mock_sdtm_summary):
+    library_client = LibraryClient("api_key")
+    sdtmig = SDTM(mock_wiki_client, library_client, mock_sdtm_summary, "sdtmig", "3-4", None, Config({}))
+    variables = []
+    for i in range(3):
+        variable = BaseVariable(sdtmig)
+        variable.name = f"VAR{i}"
+        variable.links = {"rootItem": {"href": f"/mdr/root/sdtmig/datasets/AE/variables/VAR{i}"}}
+        variables.append(variable)
+    with patch.object(LibraryClient, "_fetch_api_json", side_effect=Exception("404")) as fetch:
+        sdtmig.set_prior_versions(variables)
+    # Every missing root item is requested once, by the prefetch
+    assert fetch.call_count == 3
+    assert all("priorVersion" not in variable.links for variable in variables)
@@ -0,0 +1,208 @@
+import json
+import pytest
+from logging import getLogger
+from unittest.mock import Mock
+from azure.cosmos.exceptions import CosmosHttpResponseError, CosmosResourceNotFoundError
+from db_models.cosmos_db_service import CosmosDBService
+
+
+@pytest.fixture()
+def db_service():
+    service = CosmosDBService()
+    service._logger = getLogger("cosmos-db-service")
+    service._container_name = "igdocs"
+    service._container = Mock()
+    return service
+
+
+def throttled_error():
+    error = CosmosHttpResponseError(status_code=429, message="Request rate is large")
+    error.headers = {"x-ms-retry-after-ms": "1"}
+    return error
+
+
+def test_bulk_upsert(db_service):
+    def upsert_item(body, response_hook):
+        response_hook({"x-ms-request-charge": "10.5"}, body)
+    db_service._container.upsert_item.side_effect = upsert_item
+    stats = db_service.bulk_upsert({"id": str(i)} for i in range(100))
+    assert stats == {"upserted": 100, "failed": 0, "requestCharge": 1050.0}
+    assert db_service._container.upsert_item.call_count == 100
+
+
+def test_bulk_upsert_retries_throttled_requests(db_service):
+    responses = [throttled_error(), throttled_error(), None]
+    def upsert_item(body, response_hook):
+        response = responses.pop(0)
+        if response:
+            raise response
+        response_hook({"x-ms-request-charge": "1"}, body)
+    db_service._container.upsert_item.side_effect = upsert_item
+    stats = db_service.bulk_upsert([{"id": "1"}])
+    assert stats["upserted"] == 1
+    assert db_service._container.upsert_item.call_count == 3
+
+
+def test_bulk_upsert_reports_failures(db_service):
+    db_service._container.upsert_item.side_effect = CosmosHttpResponseError(status_code=400, message="Bad request")
+    stats = db_service.bulk_upsert([{"id": "1"}, {"id": "2"}])
+    assert stats["failed"] == 2
+    assert stats["upserted"] == 0
+
+
+def test_query_items_is_lazy_and_projected(db_service):
+    pages = [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]]
+    db_service._container.query_items.return_value.by_page.return_value = iter(pages)
+    db_service._container.client_connection.last_response_headers = {"x-ms-request-charge": "2.5"}
+    items = db_service.query_items(query_params={"standard": "tig"}, fields=["id", "pageId"], page_size=2)
+    db_service._container.query_items.assert_not_called()
+    assert next(items) == {"id": "1"}
+    search_params = db_service._container.query_items.call_args.kwargs
+    assert search_params["query"].startswith("SELECT C.id, C.pageId FROM igdocs C WHERE")
+    assert search_params["max_item_count"] == 2
+    assert [item["id"] for item in items] == ["2", "3"]
+
+
+def test_query_items_is_parameterized(db_service):
+    db_service._container.query_items.return_value.by_page.return_value = iter([])
+    list(db_service.query_items(query_params={"standard": "tig", "section": None, "pageId": "O'Brien"}))
+    search_params = db_service._container.query_items.call_args.kwargs
+    assert search_params["query"] == "SELECT * FROM igdocs C WHERE C.standard=@p0 AND NOT IS_DEFINED(C.section) AND C.pageId=@p1"
+    assert search_params["parameters"] == [{"name": "@p0", "value": "tig"}, {"name": "@p1", "value": "O'Brien"}]
+    assert search_params["enable_cross_partition_query"]
+
+
+def test_query_items_reuses_query_text(db_service):
+    db_service._container.query_items.return_value.by_page.side_effect = lambda: iter([])
+    list(db_service.query_items(query_params={"standard": "tig", "version": "1-0"}))
+    list(db_service.query_items(query_params={"standard": "sdtmig", "version": "3-4"}))
+    assert len(db_service._query_cache) == 1
+
+
+def test_query_items_targets_single_partition(db_service):
+    db_service._container.query_items.return_value.by_page.return_value = iter([])
+    list(db_service.query_items(query_params={"id": "1234"}))
+    search_params = db_service._container.query_items.call_args.kwargs
+    assert search_params["partition_key"] == "1234"
+    assert "enable_cross_partition_query" not in search_params
+
+
+def test_bulk_delete(db_service):
+    def delete_item(item, partition_key, response_hook):
+        if item == "missing":
+            raise CosmosResourceNotFoundError(status_code=404, message="Not found")
+        response_hook({"x-ms-request-charge": "5"}, None)
+    db_service._container.delete_item.side_effect = delete_item
+    stats = db_service.bulk_delete(["1", "2", "missing"])
+    assert stats == {"deleted": 3, "failed": 0, "requestCharge": 10.0}
+
+
+class FakePages:
+    def __init__(self, pages, continuation_token):
+        self.pages = pages
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        for i, page in enumerate(self.pages):
+            self.continuation_token = f"token-{i + 1}"
+            yield page
+
+
+def test_copy_all_checkpoints_pages(db_service, tmp_path):
+    checkpoint_file = str(tmp_path / "checkpoint.txt")
+    source = CosmosDBService()
+    source._container = Mock()
+    source._container.read_all_items.return_value.by_page.side_effect = \
+        lambda token: FakePages([[{"id": "1"}, {"id": "2"}], [{"id": "3"}]], token)
+    saved_tokens = []
+    def upsert_item(body, response_hook):
+        if body["id"] == "3":
+            saved_tokens.append(json.load(open(checkpoint_file))["continuationToken"])
+    db_service._container.upsert_item.side_effect = upsert_item
+
+    stats = CosmosDBService.copy_all(source, db_service, lambda item: {**item, "copied": True}, checkpoint_file=checkpoint_file)
+
+    assert stats["copied"] == 3
+    assert saved_tokens == ["token-1"]
+    assert all(call.kwargs["body"]["copied"] for call in db_service._container.upsert_item.call_args_list)
+    source._container.read_all_items.return_value.by_page.assert_called_once_with(None)
+    assert not (tmp_path / "checkpoint.txt").exists()
+
+
+def test_copy_all_resumes_and_keeps_checkpoint_on_failure(db_service, tmp_path):
+    checkpoint_file = tmp_path / "checkpoint.txt"
+    source = CosmosDBService()
+    checkpoint = {
+        "source": source._get_checkpoint_name(),
+        "target": db_service._get_checkpoint_name(),
+        "continuationToken": "token-1",
+    }
+    checkpoint_file.write_text(json.dumps(checkpoint))
+    source._container = Mock()
+    source._container.read_all_items.return_value.by_page.return_value = FakePages([[{"id": "3"}]], "token-1")
+    db_service._container.upsert_item.side_effect = CosmosHttpResponseError(status_code=400, message="Bad request")
+
+    with pytest.raises(Exception):
+        CosmosDBService.copy_all(source, db_service, checkpoint_file=str(checkpoint_file))
+
+    source._container.read_all_items.return_value.by_page.assert_called_once_with("token-1")
+    assert json.loads(checkpoint_file.read_text()) == checkpoint
+
+
+def test_copy_all_ignores_checkpoint_of_other_tables(db_service, tmp_path):
+    checkpoint_file = tmp_path / "checkpoint.txt"
+    source = CosmosDBService()
+    source._container_name = "igdocs"
+    checkpoint_file.write_text(json.dumps({
+        "source": source._get_checkpoint_name(),
+        "target": "https://other.documents.azure.com/db/igdocs",
+        "continuationToken": "token-1",
+    }))
+    source._container = Mock()
+    source._container.read_all_items.return_value.by_page.side_effect = lambda token: FakePages([[{"id": "1"}]], token)
+
+    stats = CosmosDBService.copy_all(source, db_service, checkpoint_file=str(checkpoint_file))
+
+    assert stats["copied"] == 1
+    source._container.read_all_items.return_value.by_page.assert_called_once_with(None)
+
+
+def test_replace_all_deletes_stale_items_after_copy(db_service):
+    source = CosmosDBService()
+    source._logger = getLogger("cosmos-db-service")
+    source._container = Mock()
+    source._container.read_all_items.return_value.by_page.return_value = FakePages([[{"id": "1"}]], None)
+    source._container.query_items.return_value.by_page.return_value = iter([[{"id": "1"}]])
+    db_service._container.query_items.return_value.by_page.return_value = iter([[{"id": "1"}, {"id": "2"}]])
+
+    stats = CosmosDBService.replace_all(source, db_service)
+
+    assert stats["copied"] == 1
+    assert stats["deleted"] == 1
+    db_service._container.delete_item.assert_called_once()
+    assert db_service._container.delete_item.call_args.kwargs["item"] == "2"
+
+
+def test_sync_all_only_writes_differences(db_service):
+    source = CosmosDBService()
+    source._logger = getLogger("cosmos-db-service")
+    source._container = Mock()
+    source._container.query_items.return_value.by_page.return_value = iter([[
+        {"id": "unchanged", "updatedAt": "1"},
+        {"id": "changed", "updatedAt": "2"},
+        {"id": "new", "updatedAt": "1"},
+    ]])
+    source._container.read_item.side_effect = lambda item, partition_key, response_hook: {"id": item, "html": "source"}
+    db_service._container.query_items.return_value.by_page.return_value = iter([[
+        {"id": "unchanged", "updatedAt": "1"},
+        {"id": "changed", "updatedAt": "1"},
+        {"id": "removed", "updatedAt": "1"},
+    ]])
+
+    stats = CosmosDBService.sync_all(source, db_service, transformation=lambda item: {**item, "html": "target"})
+
+    assert (stats["copied"], stats["deleted"], stats["unchanged"], stats["failed"]) == (2, 1, 1, 0)
+    upserted = sorted(call.kwargs["body"]["id"] for call in db_service._container.upsert_item.call_args_list)
+    assert upserted == ["changed", "new"]
+    assert all(call.kwargs["body"]["html"] == "target" for call in db_service._container.upsert_item.call_args_list)
+    assert db_service._container.delete_item.call_args.kwargs["item"] == "removed"
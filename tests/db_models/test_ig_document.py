@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import Mock, patch
+from db_models.ig_document import IGDocument
+
+
+@pytest.fixture()
+def mock_db_service():
+    db_service = Mock()
+    with patch("db_models.ig_document.CosmosDBService.get_instance", return_value=db_service), \
+            patch("db_models.base_db_model.CosmosDBService.get_instance", return_value=db_service):
+        yield db_service
+
+
+def record_params(page_id):
+    return {
+        "id": "new-id",
+        "pageId": page_id,
+        "standard": "tig",
+        "version": "1-0",
+        "title": "Page",
+        "html": "<p>text</p>",
+        "text": "text",
+    }
+
+
+def test_get_or_create_resolves_against_page_index(mock_db_service):
+    mock_db_service.query_items.return_value = [
+        {"id": "existing-id", "pageId": "1", "createdAt": "2020-01-01T00:00:00"}
+    ]
+    IGDocument.load_page_index("tig", "1-0")
+    try:
+        existing = IGDocument.get_or_create(record_params("1"))
+        new = IGDocument.get_or_create(record_params("2"))
+    finally:
+        IGDocument.clear_page_index("tig", "1-0")
+    assert existing.id == "existing-id"
+    assert existing.created_at == "2020-01-01T00:00:00"
+    assert existing.html == "<p>text</p>"
+    assert new.id == "new-id"
+    assert mock_db_service.query_items.call_count == 1
+    assert "html" not in mock_db_service.query_items.call_args.kwargs["fields"]
+
+
+def test_get_or_create_without_page_index_queries_db(mock_db_service):
+    mock_db_service.query_items.return_value = []
+    document = IGDocument.get_or_create(record_params("1"))
+    assert document.id == "new-id"
+    mock_db_service.query_items.assert_called_once()
+
+
+def test_delete_except_deletes_stale_documents(mock_db_service):
+    mock_db_service.query_items.return_value = iter([
+        {"id": "a", "pageId": "1"},
+        {"id": "b", "pageId": "2"},
+        {"id": "c", "pageId": "3"},
+    ])
+    mock_db_service.bulk_delete.side_effect = lambda ids: {"deleted": len(list(ids))}
+    stats = IGDocument.delete_except({"standard": "tig", "version": "1-0", "page_ids": {"2"}})
+    assert stats == {"deleted": 2}
+    assert mock_db_service.query_items.call_args.kwargs["fields"] == ["id", "pageId"]
@@ -0,0 +1,18 @@
+from unittest.mock import patch
+from product_types.product_factory import ProductFactory
+from utilities.config import Config
+from utilities import constants
+
+
+def build_summary(product_type, version):
+    summary = {"name": product_type, "_links": {"self": {"href": f"/mdr/{product_type}/{version}"}}}
+    return product_type, version, summary
+
+
+def test_products_share_library_client():
+    factory = ProductFactory("username", "password", "api_key")
+    with patch.object(ProductFactory, "get_summary", side_effect=[build_summary("sdtmig", "3-4"), build_summary("cdashig", "2-1")]):
+        sdtmig = factory.build_product(Config({constants.SUMMARY: "1"}))
+        cdashig = factory.build_product(Config({constants.SUMMARY: "2"}))
+    assert sdtmig.library_client is factory.library_client
+    assert cdashig.library_client is factory.library_client
@@ -0,0 +1,70 @@
+import asyncio
+from unittest.mock import patch
+from utilities.async_library_client import AsyncLibraryClient
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_get_many_coalesces_duplicate_requests():
+    calls = []
+
+    async def request(self, url):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return 200, '{"href": "%s"}' % url, None
+
+    async def get_many():
+        async with AsyncLibraryClient("api_key") as client:
+            return await client.get_many(["/a", "/b", "/a", "/a"])
+
+    with patch.object(AsyncLibraryClient, "_request", request):
+        responses = run(get_many())
+    assert set(responses.keys()) == {"/a", "/b"}
+    assert len(calls) == 2
+
+
+def test_get_api_json_retries_throttled_requests():
+    statuses = [429, 503, 200]
+
+    async def request(self, url):
+        return statuses.pop(0), "{}", 0
+
+    async def get():
+        async with AsyncLibraryClient("api_key") as client:
+            return await client.get_api_json("/mdr/products")
+
+    with patch.object(AsyncLibraryClient, "_request", request):
+        assert run(get()) == {}
+    assert statuses == []
+
+
+def test_get_many_reports_failures_as_none():
+    async def request(self, url):
+        return 404, "", None
+
+    async def get_many():
+        async with AsyncLibraryClient("api_key") as client:
+            return await client.get_many(["/missing"])
+
+    with patch.object(AsyncLibraryClient, "_request", request):
+        assert run(get_many()) == {"/missing": None}
+
+
+def test_get_api_json_retries_timeouts():
+    responses = [asyncio.TimeoutError(), (200, "{}", None)]
+
+    async def request(self, url):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def get():
+        async with AsyncLibraryClient("api_key", backoff_factor=0) as client:
+            return await client.get_api_json("/mdr/products")
+
+    with patch.object(AsyncLibraryClient, "_request", request):
+        assert run(get()) == {}
+    assert responses == []
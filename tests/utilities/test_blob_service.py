@@ -0,0 +1,44 @@
+import gzip
+import json
+from unittest.mock import patch
+from utilities.blob_service import BlobService
+
+
+def test_container_client_is_shared_across_uploads():
+    with patch("utilities.blob_service.ContainerClient.from_connection_string") as from_connection_string:
+        blob_service = BlobService("images")
+        blob_service.upload_file(b"a", "a.png")
+        blob_service.upload_json({"name": "b"}, "b.json")
+    from_connection_string.assert_called_once()
+    assert from_connection_string.return_value.upload_blob.call_count == 2
+
+
+def test_upload_many_reports_failed_blobs():
+    with patch("utilities.blob_service.ContainerClient.from_connection_string") as from_connection_string:
+        def upload_blob(blob_name, data, overwrite, metadata):
+            if blob_name == "b.png":
+                raise Exception("Upload failed")
+        from_connection_string.return_value.upload_blob.side_effect = upload_blob
+        stats = BlobService("images").upload_many([("a.png", b"aa", None), ("b.png", b"b", None)], max_concurrency=2)
+    assert stats == {"uploaded": 1, "uploadedBytes": 2, "failed": ["b.png"]}
+
+
+def upload_json(product_document, **kwargs):
+    with patch("utilities.blob_service.ContainerClient.from_connection_string") as from_connection_string:
+        BlobService("generated-json").upload_json(product_document, "doc.json", **kwargs)
+    call = from_connection_string.return_value.upload_blob.call_args
+    return b"".join(call.args[1]), call.kwargs["content_settings"]
+
+
+def test_upload_json_streams_indented_json():
+    document = {"name": "TIG", "classes": [{"id": 1}]}
+    data, content_settings = upload_json(document)
+    assert data.decode("utf-8") == json.dumps(document, indent=4, sort_keys=True)
+    assert content_settings.content_encoding is None
+
+
+def test_upload_json_compact_and_gzip():
+    document = {"name": "TIG", "classes": [{"id": 1}]}
+    data, content_settings = upload_json(document, compact=True, compress=True)
+    assert gzip.decompress(data).decode("utf-8") == '{"classes":[{"id":1}],"name":"TIG"}'
+    assert content_settings.content_encoding == "gzip"
@@ -0,0 +1,146 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from utilities.library_client import LibraryClient
+from utilities.response_cache import ResponseCache
+
+
+@pytest.fixture()
+def response_cache(tmp_path):
+    return ResponseCache(str(tmp_path))
+
+
+def test_get_api_json_uses_response_cache(response_cache):
+    client = LibraryClient("api_key", response_cache)
+    with patch.object(LibraryClient, "_fetch_api_json", return_value={"name": "SDTM"}) as fetch:
+        assert client.get_api_json("/mdr/sdtm/1-8") == {"name": "SDTM"}
+    # A new client should be served from disk without a request
+    second_client = LibraryClient("api_key", response_cache)
+    with patch.object(LibraryClient, "_fetch_api_json") as fetch:
+        assert second_client.get_api_json("/mdr/sdtm/1-8") == {"name": "SDTM"}
+        fetch.assert_not_called()
+
+
+def test_get_api_json_offline_cache_miss(tmp_path):
+    client = LibraryClient("api_key", ResponseCache(str(tmp_path), offline=True))
+    with patch.object(LibraryClient, "_fetch_api_json") as fetch:
+        with pytest.raises(Exception):
+            client.get_api_json("/mdr/sdtm/1-8")
+        fetch.assert_not_called()
+
+
+def test_response_cache_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.set("/mdr/products", {"_links": {}})
+    assert cache.get("/mdr/products") == {"_links": {}}
+    with patch("utilities.response_cache.time.time", return_value=10**12):
+        assert cache.get("/mdr/products") is None
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("/first", {"value": "a" * 100})
+    entry_size = cache._size
+    cache.max_size = entry_size * 2 + entry_size // 2
+    first_path = cache._get_path("/first")
+    os.utime(first_path, (0, 0))
+    cache.set("/second", {"value": "b" * 100})
+    os.utime(cache._get_path("/second"), (1, 1))
+    # Reading /first makes it the most recently used entry
+    assert cache.get("/first") is not None
+    cache.set("/third", {"value": "c" * 100})
+    assert cache.get("/second") is None
+    assert cache.get("/first") is not None
+    assert cache.get("/third") is not None
+
+
+def test_response_cache_evicts_without_scanning_directory(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.set("/entry0", {"value": "a" * 100})
+    cache.max_size = cache._size * 3
+    with patch.object(ResponseCache, "_entry_paths") as entry_paths:
+        for i in range(1, 6):
+            cache.set(f"/entry{i}", {"value": "a" * 100})
+        entry_paths.assert_not_called()
+    assert cache._size <= cache.max_size
+    assert cache.get("/entry0") is None
+    assert cache.get("/entry5") is not None
+    # A new cache over the same directory restores the entries in least recently used order
+    assert list(ResponseCache(str(tmp_path))._entries) == list(cache._entries)
+
+
+def test_build_from_environment_prefers_arguments(tmp_path, monkeypatch):
+    monkeypatch.setenv("LIBRARY_CACHE_DIRECTORY", str(tmp_path))
+    monkeypatch.setenv("LIBRARY_CACHE_TTL", "60")
+    monkeypatch.setenv("LIBRARY_CACHE_MAX_SIZE", "1000")
+    cache = ResponseCache.build_from_environment(ttl=10)
+    assert cache.directory == str(tmp_path)
+    assert cache.ttl == 10
+    assert cache.max_size == 1000
+
+
+def test_prefetch_api_json_populates_cache():
+    client = LibraryClient("api_key")
+    hrefs = [f"/mdr/root/sdtmig/datasets/AE/variables/VAR{i}" for i in range(20)]
+    with patch.object(LibraryClient, "_fetch_api_json", side_effect=lambda href: {"href": href}) as fetch:
+        fetched = client.prefetch_api_json(hrefs + hrefs[:5] + [None])
+        assert fetched == len(hrefs)
+        assert fetch.call_count == len(hrefs)
+        assert client.get_api_json(hrefs[0]) == {"href": hrefs[0]}
+        assert fetch.call_count == len(hrefs)
+
+
+def test_prefetch_api_json_ignores_failures():
+    client = LibraryClient("api_key")
+    def fetch(href):
+        if href.endswith("missing"):
+            raise Exception("404")
+        return {}
+    with patch.object(LibraryClient, "_fetch_api_json", side_effect=fetch):
+        assert client.prefetch_api_json(["/found", "/missing"]) == 1
+
+
+def test_get_codelist_mapping_persists_compact_mapping(response_cache):
+    package = {"codelists": [
+        {"submissionValue": "FREQ", "conceptId": "C71113", "terms": [{"conceptId": "C25473"}]},
+        {"submissionValue": "NY", "conceptId": "C66742", "terms": []},
+    ]}
+    client = LibraryClient("api_key", response_cache)
+    with patch.object(LibraryClient, "_fetch_api_json", return_value=package):
+        mapping = client.get_codelist_mapping("/mdr/ct/packages/sdtmct-2023-12-15")
+    assert mapping == {"FREQ": "C71113", "NY": "C66742"}
+    assert response_cache.get("/mdr/ct/packages/sdtmct-2023-12-15") is None
+    second_client = LibraryClient("api_key", ResponseCache(response_cache.directory, offline=True))
+    with patch.object(LibraryClient, "_fetch_api_json") as fetch:
+        assert second_client.get_codelist_mapping("/mdr/ct/packages/sdtmct-2023-12-15") == mapping
+        fetch.assert_not_called()
+
+
+def test_check_api_links_checks_unique_links():
+    client = LibraryClient("api_key")
+    with patch.object(LibraryClient, "_fetch_api_json", return_value={}):
+        client.get_api_json("/mdr/sdtm/1-8")
+    def head(url, headers, allow_redirects):
+        return MagicMock(status_code=404 if url.endswith("missing") else 200)
+    with patch("utilities.library_client.http.head", side_effect=head) as head_request:
+        failed = client.check_api_links(["/mdr/sdtm/1-8", "/mdr/sdtm/2-0", "/mdr/sdtm/2-0", "/mdr/missing", None])
+    assert failed == {"/mdr/missing"}
+    # Links already loaded by get_api_json are not requested again
+    assert sorted(call.args[0] for call in head_request.call_args_list) == [
+        client.base_api_url + "/mdr/missing", client.base_api_url + "/mdr/sdtm/2-0"
+    ]
+
+
+def test_check_api_link_follows_redirects_and_falls_back_to_get():
+    client = LibraryClient("api_key")
+    def head(url, headers, allow_redirects=False):
+        if url.endswith("/mdr/sdtmig/3-2"):
+            return MagicMock(status_code=200 if allow_redirects else 301)
+        return MagicMock(status_code=403)
+    with patch("utilities.library_client.http.head", side_effect=head), \
+            patch.object(LibraryClient, "_fetch_api_json", return_value={}) as fetch:
+        assert client.check_api_link("/mdr/sdtmig/3-2")
+        fetch.assert_not_called()
+        # A HEAD specific error is confirmed with a GET request
+        assert client.check_api_link("/mdr/sdtmig/3-3")
+        fetch.assert_called_once_with("/mdr/sdtmig/3-3")
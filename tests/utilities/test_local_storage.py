@@ -0,0 +1,63 @@
+import os
+from logging import getLogger
+from unittest.mock import patch
+from azure.core.exceptions import ResourceNotFoundError
+import pytest
+from benchmark_storage import generate_records, run_benchmark
+from db_models.cosmos_db_service import CosmosDBService
+from utilities.local_storage import LocalBlobContainer, LocalCosmosContainer, is_local_connection_string
+
+
+@pytest.fixture()
+def db_service():
+    service = CosmosDBService()
+    service._logger = getLogger("cosmos-db-service")
+    service._container_name = "igdocs"
+    service._container = LocalCosmosContainer()
+    return service
+
+
+def test_is_local_connection_string():
+    assert is_local_connection_string("UseLocalStorage=true;Latency=0.01")
+    assert not is_local_connection_string("AccountEndpoint=https://example.documents.azure.com:443/;AccountKey=key;")
+    assert not is_local_connection_string(None)
+
+
+def test_local_container_supports_service_queries(db_service):
+    db_service.bulk_upsert([
+        {"id": "1", "standard": "tig", "pageId": "a", "section": "Intro"},
+        {"id": "2", "standard": "tig", "pageId": "b"},
+        {"id": "3", "standard": "sdtmig", "pageId": "c"},
+    ])
+    items = list(db_service.query_items(query_params={"standard": "tig", "section": None}, fields=["id", "pageId"]))
+    assert items == [{"id": "2", "pageId": "b"}]
+    assert [item["id"] for item in db_service.query_items(query_params={"id": "3"})] == ["3"]
+    assert len(list(db_service.query_items(page_size=1))) == 3
+
+
+def test_local_container_throttles_above_throughput(db_service):
+    db_service._container = LocalCosmosContainer(throughput=10, client_retries=0)
+    stats = db_service.bulk_upsert([{"id": str(i)} for i in range(4)], max_concurrency=1)
+    assert stats["upserted"] == 4
+    assert db_service._container.stats["throttled"] > 0
+    assert db_service._container.stats["requestCharge"] == 20
+
+
+def test_local_blob_container_is_shared_by_connection_string():
+    connection_string = "UseLocalStorage=true;Run=shared"
+    container = LocalBlobContainer.from_connection_string(connection_string, "images")
+    container.upload_blob("a.png", [b"a", b"b"], metadata={"content_hash": "1"})
+    shared_container = LocalBlobContainer.from_connection_string(connection_string, "images")
+    assert shared_container.get_blob_client("a.png").get_blob_properties().metadata == {"content_hash": "1"}
+    with pytest.raises(ResourceNotFoundError):
+        shared_container.get_blob_client("b.png").get_blob_properties()
+
+
+def test_run_benchmark():
+    with patch.dict(os.environ):
+        results = run_benchmark(generate_records(30))
+    assert [result["step"] for result in results] == [
+        "load", "page index", "cleanup", "promote (replace)", "update", "promote (diff)", "image upload", "json publish"
+    ]
+    assert all(result["error"] is None for result in results)
+    assert results[0]["requests"] == 30
@@ -0,0 +1,61 @@
+import json
+from unittest.mock import patch, Mock
+from utilities.wiki_client import WikiClient
+
+
+def mock_page_responses(page_count):
+    def get(method, url, **kwargs):
+        index = int(url.split("page=")[-1]) if "page=" in url else 0
+        data = {
+            "results": [{"id": str(index)}],
+            "_links": {"base": "https://wiki.cdisc.org"}
+        }
+        if index < page_count - 1:
+            data["_links"]["next"] = f"/rest/api/content/1/child/page?page={index + 1}"
+        return Mock(status_code=200, encoding="UTF-8", text=json.dumps(data))
+    return get
+
+
+def test_get_json_follows_pagination_without_recursion():
+    client = WikiClient("user", "password")
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(2000)):
+        data = client.get_json("https://wiki.cdisc.org/rest/api/content/1/child/page")
+    assert len(data["results"]) == 2000
+
+
+def test_iter_results_is_lazy():
+    client = WikiClient("user", "password")
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(5)) as get:
+        results = client.iter_results("https://wiki.cdisc.org/rest/api/content/1/child/page")
+        assert next(results) == {"id": "0"}
+        assert get.call_count == 1
+        assert [result["id"] for result in results] == ["1", "2", "3", "4"]
+
+
+def test_iter_results_with_prefetch():
+    client = WikiClient("user", "password")
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(5)):
+        results = list(client.iter_results("https://wiki.cdisc.org/rest/api/content/1/child/page", prefetch=True))
+    assert [result["id"] for result in results] == ["0", "1", "2", "3", "4"]
+
+
+def test_iter_results_with_prefetch_reuses_one_executor():
+    client = WikiClient("user", "password")
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(1)):
+        list(client.iter_results("https://wiki.cdisc.org/rest/api/content/1/child/page", prefetch=True))
+    # A listing with a single page has nothing to prefetch
+    assert client._prefetch_executor is None
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(3)):
+        list(client.iter_results("https://wiki.cdisc.org/rest/api/content/1/child/page", prefetch=True))
+        executor = client._prefetch_executor
+        list(client.iter_results("https://wiki.cdisc.org/rest/api/content/2/child/page", prefetch=True))
+    assert executor is not None and client._prefetch_executor is executor
+
+
+def test_request_metrics():
+    client = WikiClient("user", "password")
+    with patch("utilities.wiki_client.requests.Session.request", side_effect=mock_page_responses(3)):
+        client.get_json("https://wiki.cdisc.org/rest/api/content/1/child/page")
+    metrics = client.get_request_metrics()
+    assert metrics["requests"] == 3
+    assert metrics["maxSeconds"] <= metrics["totalSeconds"]
@@ -0,0 +1,166 @@
+import pytest
+from collections import Counter
+from hashlib import sha256
+from uuid import uuid4
+from unittest.mock import patch, Mock
+from utilities.wiki_document_parser import Parser
+from db_models.ig_document import IGDocument
+
+
+def build_page(page_id):
+    return {
+        "id": page_id,
+        "title": f"Page {page_id}",
+        "body": {"view": {"value": "<p>text</p>"}},
+        "metadata": {"labels": {"results": [{"name": "section-examples"}]}}
+    }
+
+
+@pytest.fixture()
+def page_tree():
+    return {
+        "root": ["1", "2", "3"],
+        "1": ["1.1", "1.2"],
+        "2": [],
+        "3": ["3.1"],
+        "3.1": [],
+        "1.1": [],
+        "1.2": [],
+    }
+
+
+def test_get_ig_document_tree_lists_children_once_per_page(mock_wiki_client, page_tree):
+    requested = Counter()
+
+    def iter_wiki_results(page_id, path="", prefetch=False, **kwargs):
+        requested[page_id] += 1
+        return iter([build_page(child) for child in page_tree[page_id]])
+
+    mock_wiki_client.get_html.return_value = '<meta name="ajs-page-id" content="root">'
+    mock_wiki_client.iter_wiki_results.side_effect = iter_wiki_results
+    mock_wiki_client.get_page_labels.return_value = {"results": []}
+    parser = Parser(mock_wiki_client)
+    with patch("db_models.base_db_model.CosmosDBService.get_instance"), \
+            patch.object(IGDocument, "get_or_create", side_effect=IGDocument):
+        documents = parser.get_ig_document_tree("https://wiki.cdisc.org/display/TIG", "tig", "1-0")
+    assert [document.page_id for document in documents.values()] == ["1", "3", "1.1", "1.2", "3.1"]
+    assert all(count == 1 for count in requested.values())
+    mock_wiki_client.get_page_labels.assert_not_called()
+    assert all(document.section == "examples" for document in documents.values())
+
+
+def test_get_ig_document_tree_max_pages(mock_wiki_client, page_tree):
+    mock_wiki_client.get_html.return_value = '<meta name="ajs-page-id" content="root">'
+    mock_wiki_client.iter_wiki_results.side_effect = lambda page_id, **kwargs: iter([build_page(child) for child in page_tree[page_id]])
+    mock_wiki_client.get_page_labels.return_value = {"results": []}
+    parser = Parser(mock_wiki_client, max_workers=2)
+    with patch("db_models.base_db_model.CosmosDBService.get_instance"), \
+            patch.object(IGDocument, "get_or_create", side_effect=IGDocument):
+        documents = parser.get_ig_document_tree("https://wiki.cdisc.org/display/TIG", "tig", "1-0", max_pages=3)
+    page_ids = [document.page_id for document in documents.values()]
+    # The third page is the first child of whichever top level page finished first
+    assert page_ids[:2] == ["1", "3"]
+    assert page_ids[2] in ["1.1", "3.1"]
+
+
+def test_get_ig_document_tree_max_pages_keeps_siblings_of_skipped_pages(mock_wiki_client):
+    page_tree = {"root": ["s", "a", "b", "c"], "s": ["s1"], "a": ["a1"], "b": ["b1"], "c": ["c1"]}
+
+    def build_tree_page(page_id):
+        page = build_page(page_id)
+        if page_id == "s":
+            page["title"] = "Specifications"
+        return page
+
+    mock_wiki_client.get_html.return_value = '<meta name="ajs-page-id" content="root">'
+    mock_wiki_client.iter_wiki_results.side_effect = lambda page_id, **kwargs: iter([build_tree_page(child) for child in page_tree.get(page_id, [])])
+    parser = Parser(mock_wiki_client, max_workers=1)
+    with patch("db_models.base_db_model.CosmosDBService.get_instance"), \
+            patch.object(IGDocument, "get_or_create", side_effect=IGDocument):
+        documents = parser.get_ig_document_tree("https://wiki.cdisc.org/display/TIG", "tig", "1-0", max_pages=3)
+    assert [document.page_id for document in documents.values()] == ["a", "b", "c"]
+
+
+def test_parse_html_skips_unchanged_images(mock_wiki_client):
+    parser = Parser(mock_wiki_client)
+    parser.image_blob_service = Mock()
+    parser.image_blob_service.get_blob_metadata.return_value = {"source_version": "2-1600000000000"}
+    html = '<p><img src="/download/attachments/1/ae.png?version=2&modificationDate=1600000000000&api=v2"/></p>'
+    parsed_html = parser._parse_html(html, "1")
+    assert "blob.core.windows.net/images/1-ae.png" in parsed_html
+    mock_wiki_client.download_file.assert_not_called()
+    parser.image_blob_service.upload_many.assert_not_called()
+    assert parser.image_stats["skipped"] == 1
+
+
+def test_parse_html_skips_upload_of_identical_content(mock_wiki_client):
+    data = b"image"
+    parser = Parser(mock_wiki_client)
+    parser.image_blob_service = Mock()
+    parser.image_blob_service.get_blob_metadata.return_value = {"content_hash": sha256(data).hexdigest()}
+    mock_wiki_client.download_file.return_value = data
+    parser._parse_html('<img src="/download/attachments/1/ae.png?version=3&api=v2"/>', "1")
+    parser.image_blob_service.upload_many.assert_not_called()
+    assert parser.image_stats["downloadedBytes"] == len(data)
+    assert parser.image_stats["uploadedBytes"] == 0
+
+
+def test_parse_html_uploads_changed_images(mock_wiki_client):
+    parser = Parser(mock_wiki_client)
+    parser.image_blob_service = Mock()
+    parser.image_blob_service.get_blob_metadata.return_value = None
+    parser.image_blob_service.upload_many.return_value = {"uploaded": 1, "uploadedBytes": 5, "failed": []}
+    mock_wiki_client.download_file.return_value = b"image"
+    parsed_html = parser._parse_html('<img src="/download/attachments/1/ae.png?version=3&api=v2"/>', "1")
+    parser.image_blob_service.upload_many.assert_called_once()
+    assert parser.image_blob_service.upload_many.call_args.args[0][0][0] == "1-ae.png"
+    assert parser.image_blob_service.upload_many.call_args.kwargs["executor"] is parser._image_executor
+    assert "blob.core.windows.net/images/1-ae.png" in parsed_html
+    assert parser.image_stats["uploaded"] == 1
+
+
+def test_parse_html_drops_images_that_failed_to_upload(mock_wiki_client):
+    parser = Parser(mock_wiki_client)
+    parser.image_blob_service = Mock()
+    parser.image_blob_service.get_blob_metadata.return_value = None
+    parser.image_blob_service.upload_many.return_value = {"uploaded": 0, "uploadedBytes": 0, "failed": ["1-ae.png"]}
+    mock_wiki_client.download_file.return_value = b"image"
+    parsed_html = parser._parse_html('<img src="/download/attachments/1/ae.png?version=3&api=v2"/>', "1")
+    assert "blob.core.windows.net" not in parsed_html
+    assert parser.image_stats["uploaded"] == 0
+
+
+def test_get_ig_document_tree_incremental(mock_wiki_client, page_tree, monkeypatch):
+    monkeypatch.setenv("COSMOSDB_CONNECTION_STRING_DEV", f"UseLocalStorage=true;Run={uuid4()}")
+    monkeypatch.setenv("COSMOSDB_DATABASE_NAME_DEV", "test")
+    monkeypatch.setenv("COSMOSDB_IG_DOCS_TABLE_NAME_DEV", "igdocs")
+    page_versions = {page_id: 1 for page_id in page_tree}
+    page_titles = {}
+
+    def build_versioned_page(page_id):
+        page = build_page(page_id)
+        page["title"] = page_titles.get(page_id, page["title"])
+        page["version"] = {"number": page_versions[page_id]}
+        return page
+
+    mock_wiki_client.get_html.return_value = '<meta name="ajs-page-id" content="root">'
+    mock_wiki_client.iter_wiki_results.side_effect = lambda page_id, **kwargs: iter([build_versioned_page(child) for child in page_tree[page_id]])
+    first_documents = Parser(mock_wiki_client).get_ig_document_tree("https://wiki.cdisc.org/display/TIG", "tig", "1-0")
+    IGDocument.bulk_save(list(first_documents.values()))
+    existing_ids = {document.page_id: document.id for document in first_documents.values()}
+
+    page_versions["1.2"] = 2
+    page_versions["3.1"] = 2
+    page_titles["3.1"] = "Renamed"
+    parser = Parser(mock_wiki_client)
+    # The stored page index is loaded with the projected query, not patched
+    documents = parser.get_ig_document_tree("https://wiki.cdisc.org/display/TIG", "tig", "1-0", incremental=True)
+    assert set(documents.keys()) == {existing_ids[page_id] for page_id in ["1", "1.1", "1.2", "3", "3.1"]}
+    # Page 3 is changed because its child was renamed
+    assert parser.unchanged_document_ids == {existing_ids[page_id] for page_id in ["1", "1.1"]}
+    assert documents[existing_ids["1"]].standard == "tig"
+    assert documents[existing_ids["1"]].children == [existing_ids["1.1"], existing_ids["1.2"]]
+    assert documents[existing_ids["1.2"]].html is not None
+    IGDocument.bulk_save([document for document in documents.values() if document.id not in parser.unchanged_document_ids])
+    stored_parent = IGDocument._get_db_service()._container.read_item(existing_ids["3"], existing_ids["3"])
+    assert stored_parent["childrenTitles"] == ["Renamed"]
\ No newline at end of file
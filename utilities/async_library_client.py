@@ -0,0 +1,127 @@
+import asyncio
+import json
+import aiohttp
+from utilities import logger
+from utilities.library_client import BASE_API_URL, DEFAULT_MAX_WORKERS, RETRIES, RETRY_STATUSES, build_request_headers
+from utilities.response_cache import ResponseCache
+
+DEFAULT_TIMEOUT = 60
+
+class AsyncLibraryClient:
+    """
+    Asynchronous variant of LibraryClient built on aiohttp.
+
+    Concurrent requests for the same href are coalesced into a single request and
+    successful responses are memoized for the lifetime of the client. Connection errors, timeouts
+    and the statuses retried by LibraryClient are retried with exponential backoff.
+    Must be used as an async context manager:
+
+        async with AsyncLibraryClient(api_key) as client:
+            responses = await client.get_many(hrefs)
+    """
+
+    def __init__(
+        self,
+        api_key,
+        response_cache: ResponseCache = None,
+        limit_per_host: int = DEFAULT_MAX_WORKERS,
+        retries: int = RETRIES,
+        backoff_factor: float = 0.5,
+        timeout: float = DEFAULT_TIMEOUT
+    ):
+        self.base_api_url = BASE_API_URL
+        self.api_key = api_key
+        self.response_cache = response_cache
+        self.limit_per_host = limit_per_host
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff_factor = backoff_factor
+        self._session: aiohttp.ClientSession = None
+        self._responses = {}
+        self._in_flight = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=build_request_headers(self.api_key),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+
+    async def get_api_json(self, href):
+        if href in self._responses:
+            return self._responses[href]
+        if href in self._in_flight:
+            return await asyncio.shield(self._in_flight[href])
+        if self.response_cache:
+            cached_data = self.response_cache.get(href)
+            if cached_data is not None:
+                self._responses[href] = cached_data
+                return cached_data
+            if self.response_cache.offline:
+                raise Exception(f"Request to {self.base_api_url+href} is not cached and the library cache is offline")
+        task = asyncio.ensure_future(self._fetch_api_json(href))
+        self._in_flight[href] = task
+        try:
+            data = await asyncio.shield(task)
+        finally:
+            self._in_flight.pop(href, None)
+        self._responses[href] = data
+        if self.response_cache:
+            self.response_cache.set(href, data)
+        return data
+
+    async def get_many(self, hrefs: [str]) -> dict:
+        """
+        Resolves a batch of hrefs concurrently.
+
+        Returns:
+        A dictionary mapping each href to its response, or None if the request failed
+        """
+        unique_hrefs = list(dict.fromkeys(href for href in hrefs if href))
+        results = await asyncio.gather(*[self.get_api_json(href) for href in unique_hrefs], return_exceptions=True)
+        responses = {}
+        for href, result in zip(unique_hrefs, results):
+            if isinstance(result, Exception):
+                logger.debug(f"Request to {self.base_api_url+href} failed: {result}")
+                responses[href] = None
+            else:
+                responses[href] = result
+        return responses
+
+    async def _fetch_api_json(self, href):
+        url = self.base_api_url + href
+        for attempt in range(self.retries + 1):
+            try:
+                status, text, retry_after = await self._request(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise Exception(f"Request to {url} failed: {e}")
+                await asyncio.sleep(self._get_backoff(attempt))
+                continue
+            if status == 200:
+                return json.loads(text)
+            if status not in RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(retry_after if retry_after is not None else self._get_backoff(attempt))
+        raise Exception(f"Request to {url} returned unsuccessful {status} response")
+
+    async def _request(self, url):
+        async with self._session.get(url) as response:
+            text = await response.text()
+            return response.status, text, self._parse_retry_after(response.headers.get("Retry-After"))
+
+    def _get_backoff(self, attempt: int) -> float:
+        return self.backoff_factor * (2 ** attempt)
+
+    @staticmethod
+    def _parse_retry_after(value: str) -> float:
+        try:
+            return max(float(value), 0)
+        except (TypeError, ValueError):
+            return None
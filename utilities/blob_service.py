@@ -1,31 +1,147 @@
-from json import dumps
+import threading
+import zlib
+from concurrent.futures import Executor, ThreadPoolExecutor
+from json import JSONEncoder
 from os import environ
-from azure.storage.blob import BlobClient
+from typing import Iterable, Iterator
+import requests
+from azure.core.exceptions import ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
+from azure.storage.blob import ContainerClient, ContentSettings
+from requests.adapters import HTTPAdapter
+from utilities import logger
+from utilities.local_storage import LocalBlobContainer, is_local_connection_string
 import utilities.constants as constants
 
+DEFAULT_MAX_CONCURRENCY = 8
+JSON_CHUNK_SIZE = 4 * 1024 * 1024
+
 
 class BlobService:
+    """
+    Facade over a blob storage container.
+    A single ContainerClient is created on first use and shared by all requests of the service,
+    so uploads reuse pooled connections instead of opening a new client per blob.
+    """
 
-    def __init__(self, container_name: str):
+    def __init__(self, container_name: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
         self.connection_string = environ.get(constants.AZURE_CONNECTION_STRING)
         self.container_name = container_name
+        self.max_concurrency = max_concurrency
+        self._container_client: ContainerClient = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def container_client(self) -> ContainerClient:
+        with self._client_lock:
+            if self._container_client is None and is_local_connection_string(self.connection_string):
+                self._container_client = LocalBlobContainer.from_connection_string(self.connection_string, self.container_name)
+            elif self._container_client is None:
+                self._container_client = ContainerClient.from_connection_string(
+                    conn_str=self.connection_string,
+                    container_name=self.container_name,
+                    transport=self._create_transport()
+                )
+            return self._container_client
+
+    def _create_transport(self) -> RequestsTransport:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return RequestsTransport(session=session, session_owner=False)
 
-    def upload_json(self, product_document: any, blob_name: str):
-        blob_client: BlobClient = BlobClient.from_connection_string(
-            conn_str=self.connection_string,
-            container_name=self.container_name,
-            blob_name=blob_name
+    def upload_json(self, product_document: any, blob_name: str, compact: bool = False, compress: bool = False):
+        """
+        Uploads a document as json without building the whole json text in memory.
+        The document is encoded incrementally and uploaded in chunks.
+        compact drops the indentation and compress stores the blob gzip encoded.
+        """
+        content_settings = ContentSettings(
+            content_type="application/json",
+            content_encoding="gzip" if compress else None
         )
-        blob_client.upload_blob(
-            dumps(product_document, indent=4, sort_keys=True), overwrite=True
+        self.container_client.upload_blob(
+            blob_name,
+            self._encode_json(product_document, compact, compress),
+            overwrite=True,
+            content_settings=content_settings
         )
 
-    def upload_file(self, data, blob_name: str):
-        blob_client: BlobClient = BlobClient.from_connection_string(
-            conn_str=self.connection_string,
-            container_name=self.container_name,
-            blob_name=blob_name
+    @staticmethod
+    def _encode_json(document: any, compact: bool, compress: bool) -> Iterator[bytes]:
+        encoder = JSONEncoder(
+            indent=None if compact else 4,
+            separators=(",", ":") if compact else None,
+            sort_keys=True
         )
-        blob_client.upload_blob(
-            data, overwrite=True
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        buffer = []
+        buffer_size = 0
+        for chunk in encoder.iterencode(document):
+            data = chunk.encode("utf-8")
+            if compressor:
+                data = compressor.compress(data)
+            buffer.append(data)
+            buffer_size = buffer_size + len(data)
+            if buffer_size >= JSON_CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer = []
+                buffer_size = 0
+        if compressor:
+            buffer.append(compressor.flush())
+        if buffer:
+            yield b"".join(buffer)
+
+    def upload_file(self, data, blob_name: str, metadata: dict = None):
+        self.container_client.upload_blob(
+            blob_name, data, overwrite=True, metadata=metadata
         )
+
+    def upload_many(self, blobs: Iterable[tuple], max_concurrency: int = None, executor: Executor = None) -> dict:
+        """
+        Uploads (blob_name, data, metadata) tuples concurrently.
+        Callers uploading from several threads can pass a shared executor no wider than the service's max_concurrency,
+        so uploads never outnumber the pooled connections.
+
+        Returns:
+        The number of uploaded blobs and bytes, and the names of the blobs that failed to upload
+        """
+        stats = {"uploaded": 0, "uploadedBytes": 0, "failed": []}
+
+        def upload(blob: tuple):
+            blob_name, data, metadata = blob
+            try:
+                self.upload_file(data, blob_name, metadata=metadata)
+                return None
+            except Exception as e:
+                logger.error(f"Failed to upload blob {blob_name} to container {self.container_name}: {e}")
+                return blob_name
+
+        blobs = list(blobs)
+        if not blobs:
+            return stats
+        if executor:
+            failed_blob_names = list(executor.map(upload, blobs))
+        else:
+            with ThreadPoolExecutor(max_workers=max_concurrency or self.max_concurrency) as upload_executor:
+                failed_blob_names = list(upload_executor.map(upload, blobs))
+        for blob, failed_blob_name in zip(blobs, failed_blob_names):
+            if failed_blob_name:
+                stats["failed"].append(failed_blob_name)
+            else:
+                stats["uploaded"] = stats["uploaded"] + 1
+                stats["uploadedBytes"] = stats["uploadedBytes"] + len(blob[1])
+        return stats
+
+    def get_blob_metadata(self, blob_name: str) -> dict:
+        """
+        Returns the metadata of a blob, or None if the blob does not exist.
+        """
+        try:
+            return self.container_client.get_blob_client(blob_name).get_blob_properties().metadata
+        except ResourceNotFoundError:
+            return None
+
+    def set_blob_metadata(self, blob_name: str, metadata: dict):
+        self.container_client.get_blob_client(blob_name).set_blob_metadata(metadata)
@@ -13,3 +13,11 @@ DATASTRUCTURES = "datastructures"
 SCENARIOS = "scenarioMetadata"
 OVERRIDESSTANDARD = "overridesStandard"
 OVERRIDESVERSION = "overridesVersion"
+
+LIBRARY_CACHE_DIRECTORY = "LIBRARY_CACHE_DIRECTORY"
+LIBRARY_CACHE_TTL = "LIBRARY_CACHE_TTL"
+LIBRARY_CACHE_MAX_SIZE = "LIBRARY_CACHE_MAX_SIZE"
+LIBRARY_CACHE_OFFLINE = "LIBRARY_CACHE_OFFLINE"
+
+GENERATED_JSON_COMPACT = "GENERATED_JSON_COMPACT"
+GENERATED_JSON_GZIP = "GENERATED_JSON_GZIP"
@@ -3,31 +3,149 @@ import json
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 from functools import cache
+from concurrent.futures import ThreadPoolExecutor
+from utilities import logger
+from utilities.response_cache import ResponseCache
+
+DEFAULT_MAX_WORKERS = 16
+BASE_API_URL = "https://dev.cdisclibrary.org/api"
+RETRIES = 3
+RETRY_STATUSES = [429, 502, 503, 504, 408]
 
 retry_strategy = Retry(
-    total=3,
-    status_forcelist=[429, 502, 503, 504, 408],
-    method_whitelist=["GET", "POST"]
+    total=RETRIES,
+    status_forcelist=RETRY_STATUSES,
+    method_whitelist=["HEAD", "GET", "POST"]
 )
-adapter = HTTPAdapter(max_retries=retry_strategy)
+adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=DEFAULT_MAX_WORKERS)
 http = requests.Session()
 http.mount("https://", adapter)
 http.mount("http://", adapter)
 
+def build_request_headers(api_key) -> dict:
+    return {
+        'Accept': 'application/json',
+        'api-key': api_key,
+        "User-Agent": "cdisc-standard-product-pipeline"
+    }
+
 class LibraryClient:
 
-    def __init__(self, api_key):
-        self.base_api_url = "https://dev.cdisclibrary.org/api"
+    def __init__(self, api_key, response_cache: ResponseCache = None):
+        self.base_api_url = BASE_API_URL
         self.api_key = api_key
+        self.response_cache = response_cache
+        # Hrefs already loaded by get_api_json, which check_api_link does not need to request again
+        self._loaded_hrefs = set()
+        # Hrefs whose last request failed, so callers can skip links a prefetch already found missing
+        self.failed_hrefs = set()
 
     @cache
     def get_api_json(self, href):
-        headers = {
-            'Accept': 'application/json',
-            'api-key': self.api_key,
-            "User-Agent": "cdisc-standard-product-pipeline"
-        }
-        raw_data = http.get(self.base_api_url+href, headers=headers)
+        if self.response_cache:
+            cached_data = self.response_cache.get(href)
+            if cached_data is not None:
+                self._loaded_hrefs.add(href)
+                self.failed_hrefs.discard(href)
+                return cached_data
+            if self.response_cache.offline:
+                raise Exception(f"Request to {self.base_api_url+href} is not cached and the library cache is offline")
+        data = self._fetch_api_json(href)
+        if self.response_cache:
+            self.response_cache.set(href, data)
+        self._loaded_hrefs.add(href)
+        self.failed_hrefs.discard(href)
+        return data
+
+    @cache
+    def check_api_link(self, href) -> bool:
+        """
+        Returns whether a library link resolves.
+        Links that are already loaded or cached are not requested again, otherwise only the
+        response headers are requested, following redirects like get_api_json does. get_api_json is used
+        when the HEAD request neither succeeds nor reports the link missing, or the library cache is offline.
+        """
+        if href in self._loaded_hrefs:
+            return True
+        if self.response_cache and (self.response_cache.offline or self.response_cache.get(href) is not None):
+            return self._try_get_api_json(href) is not None
+        try:
+            response = http.head(self.base_api_url+href, headers=self._get_headers(), allow_redirects=True)
+        except Exception as e:
+            logger.debug(f"HEAD request to {self.base_api_url+href} failed: {e}")
+            return self._try_get_api_json(href) is not None
+        if response.status_code == 200:
+            return True
+        if response.status_code == 404:
+            return False
+        return self._try_get_api_json(href) is not None
+
+    def check_api_links(self, hrefs: [str], max_workers: int = DEFAULT_MAX_WORKERS) -> set:
+        """
+        Checks a batch of hrefs concurrently, each unique href once.
+
+        Returns:
+        The set of hrefs that do not resolve
+        """
+        unique_hrefs = list(dict.fromkeys(href for href in hrefs if href))
+        if not unique_hrefs:
+            return set()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self.check_api_link, unique_hrefs))
+        return {href for href, exists in zip(unique_hrefs, results) if not exists}
+
+    @cache
+    def get_codelist_mapping(self, package_href) -> dict:
+        """
+        Returns the submissionValue -> conceptId mapping of the codelists in a CT package.
+        Published packages never change, so only the compact mapping is kept: it is stored in the
+        response cache under the package href, and the multi-megabyte package itself is not cached.
+        """
+        mapping_key = f"{package_href}#codelistMapping"
+        if self.response_cache:
+            cached_mapping = self.response_cache.get(mapping_key)
+            if cached_mapping is not None:
+                return cached_mapping
+        package = self.response_cache.get(package_href) if self.response_cache else None
+        if package is None:
+            if self.response_cache and self.response_cache.offline:
+                raise Exception(f"Request to {self.base_api_url+package_href} is not cached and the library cache is offline")
+            package = self._fetch_api_json(package_href)
+        mapping = {codelist["submissionValue"]: codelist["conceptId"] for codelist in package.get("codelists", [])}
+        if self.response_cache:
+            self.response_cache.set(mapping_key, mapping)
+        return mapping
+
+    def prefetch_api_json(self, hrefs: [str], max_workers: int = DEFAULT_MAX_WORKERS) -> int:
+        """
+        Resolves a batch of hrefs concurrently so that later calls to get_api_json are served from the cache.
+        Failed requests are ignored here and recorded in failed_hrefs.
+
+        Returns:
+        The number of hrefs successfully fetched
+        """
+        unique_hrefs = list(dict.fromkeys(href for href in hrefs if href))
+        if not unique_hrefs:
+            return 0
+        logger.info(f"Prefetching {len(unique_hrefs)} library links using {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self._try_get_api_json, unique_hrefs))
+        fetched = len([result for result in results if result is not None])
+        logger.info(f"Finished prefetching library links: {fetched}/{len(unique_hrefs)}")
+        return fetched
+
+    def _try_get_api_json(self, href):
+        try:
+            return self.get_api_json(href)
+        except Exception:
+            self.failed_hrefs.add(href)
+            return None
+
+    def _get_headers(self) -> dict:
+        return build_request_headers(self.api_key)
+
+    def _fetch_api_json(self, href):
+        raw_data = http.get(self.base_api_url+href, headers=self._get_headers())
         if raw_data.status_code == 200:
             return json.loads(raw_data.text)
         else:
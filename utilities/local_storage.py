@@ -0,0 +1,311 @@
+import json
+import math
+import re
+import threading
+import time
+from copy import deepcopy
+from types import SimpleNamespace
+from azure.core.exceptions import ResourceNotFoundError
+from azure.cosmos.exceptions import (
+    CosmosHttpResponseError,
+    CosmosResourceExistsError,
+    CosmosResourceNotFoundError,
+)
+
+# Connection strings containing UseLocalStorage=true are served by the in-process stand-ins below, e.g.
+# "UseLocalStorage=true;Latency=0.005;Throughput=400" adds 5ms to every request and throttles above 400 RU/s
+LOCAL_STORAGE_KEY = "UseLocalStorage"
+
+READ_CHARGE = 1.0
+WRITE_CHARGE_PER_KB = 5.0
+QUERY_PAGE_CHARGE = 2.5
+QUERY_CHARGE_PER_KB = 0.5
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_CLIENT_RETRIES = 9
+
+SELECT_PATTERN = re.compile(r"^SELECT (?P<fields>.+?) FROM \w+ (?P<alias>\w+)(?: WHERE (?P<where>.+))?$")
+
+
+def is_local_connection_string(connection_string: str) -> bool:
+    return parse_connection_string(connection_string).get(LOCAL_STORAGE_KEY, "").lower() == "true"
+
+
+def parse_connection_string(connection_string: str) -> dict:
+    settings = {}
+    for setting in (connection_string or "").split(";"):
+        key, _, value = setting.partition("=")
+        if key:
+            settings[key.strip()] = value.strip()
+    return settings
+
+
+class LocalCosmosContainer:
+    """
+    Dict backed stand-in for an azure-cosmos ContainerProxy, partitioned by id.
+
+    Supports the container operations and query shapes used by CosmosDBService.
+    Every request sleeps for latency seconds and is charged request units roughly
+    proportional to the size of the data it reads or writes. When throughput is set,
+    requests above that many RU per second are throttled. Like the azure-cosmos client, throttled
+    requests are retried after the requested delay up to client_retries times before a 429 error is raised.
+    """
+
+    def __init__(self, latency: float = 0.0, throughput: float = None, client_retries: int = DEFAULT_CLIENT_RETRIES):
+        self.latency = latency
+        self.throughput = throughput
+        self.client_retries = client_retries
+        self.client_connection = SimpleNamespace(last_response_headers={})
+        self.stats = {"requests": 0, "throttled": 0, "requestCharge": 0.0}
+        self._items = {}
+        self._lock = threading.Lock()
+        self._available_charge = throughput
+        self._last_refill = time.monotonic()
+
+    @staticmethod
+    def from_connection_string(connection_string: str) -> "LocalCosmosContainer":
+        settings = parse_connection_string(connection_string)
+        throughput = settings.get("Throughput")
+        return LocalCosmosContainer(
+            latency=float(settings.get("Latency", 0)),
+            throughput=float(throughput) if throughput else None,
+            client_retries=int(settings.get("ClientRetries", DEFAULT_CLIENT_RETRIES))
+        )
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "throttled": 0, "requestCharge": 0.0}
+
+    def create_item(self, body: dict, response_hook=None, **kwargs) -> dict:
+        self._charge(self._get_write_charge(body), response_hook, body)
+        with self._lock:
+            if body["id"] in self._items:
+                raise CosmosResourceExistsError(status_code=409, message=f"Item {body['id']} already exists")
+            self._items[body["id"]] = deepcopy(body)
+        return body
+
+    def upsert_item(self, body: dict, response_hook=None, **kwargs) -> dict:
+        self._charge(self._get_write_charge(body), response_hook, body)
+        with self._lock:
+            self._items[body["id"]] = deepcopy(body)
+        return body
+
+    def read_item(self, item, partition_key, response_hook=None, **kwargs) -> dict:
+        item_id = item["id"] if isinstance(item, dict) else item
+        with self._lock:
+            stored_item = deepcopy(self._items.get(item_id))
+        self._charge(READ_CHARGE, response_hook, stored_item)
+        if stored_item is None:
+            raise CosmosResourceNotFoundError(status_code=404, message=f"Item {item_id} not found")
+        return stored_item
+
+    def delete_item(self, item, partition_key, response_hook=None, **kwargs):
+        item_id = item["id"] if isinstance(item, dict) else item
+        self._charge(WRITE_CHARGE_PER_KB, response_hook)
+        with self._lock:
+            if self._items.pop(item_id, None) is None:
+                raise CosmosResourceNotFoundError(status_code=404, message=f"Item {item_id} not found")
+
+    def read_all_items(self, max_item_count: int = None, **kwargs) -> "LocalItemPaged":
+        return LocalItemPaged(self, lambda item: item, max_item_count)
+
+    def query_items(
+        self,
+        query: str,
+        parameters: list = None,
+        partition_key: str = None,
+        max_item_count: int = None,
+        **kwargs
+    ) -> "LocalItemPaged":
+        match = SELECT_PATTERN.match(query)
+        if not match:
+            raise Exception(f"Query is not supported by the local container: {query}")
+        alias = match.group("alias")
+        values = {parameter["name"]: parameter["value"] for parameter in parameters or []}
+        conditions = [self._parse_condition(condition, alias, values) for condition in (match.group("where") or "").split(" AND ") if condition]
+        if partition_key:
+            conditions.append(lambda item: item["id"] == partition_key)
+        fields = None if match.group("fields") == "*" else [
+            field.strip()[len(alias) + 1:] for field in match.group("fields").split(",")
+        ]
+
+        def transform(item: dict):
+            if not all(condition(item) for condition in conditions):
+                return None
+            if fields is None:
+                return item
+            return {field: item[field] for field in fields if field in item}
+
+        return LocalItemPaged(self, transform, max_item_count)
+
+    def _parse_condition(self, condition: str, alias: str, values: dict):
+        not_defined = re.match(rf"^NOT IS_DEFINED\({alias}\.(\w+)\)$", condition)
+        if not_defined:
+            key = not_defined.group(1)
+            return lambda item: key not in item
+        equals = re.match(rf"^{alias}\.(\w+)=(@\w+)$", condition)
+        if equals:
+            key, value = equals.group(1), values.get(equals.group(2))
+            return lambda item: key in item and item[key] == value
+        raise Exception(f"Query condition is not supported by the local container: {condition}")
+
+    def _fetch_page(self, transform, offset: int, page_size: int) -> (list, int):
+        with self._lock:
+            items = list(self._items.values())
+        page = []
+        for item in items[offset:]:
+            offset = offset + 1
+            result = transform(item)
+            if result is not None:
+                page.append(deepcopy(result))
+                if len(page) == page_size:
+                    break
+        charge = QUERY_PAGE_CHARGE + QUERY_CHARGE_PER_KB * len(json.dumps(page)) / 1024
+        self._charge(charge)
+        return page, offset if offset < len(items) else None
+
+    def _get_write_charge(self, body: dict) -> float:
+        return WRITE_CHARGE_PER_KB * max(1, math.ceil(len(json.dumps(body)) / 1024))
+
+    def _charge(self, charge: float, response_hook=None, result=None):
+        for attempt in range(self.client_retries + 1):
+            if self.latency:
+                time.sleep(self.latency)
+            retry_after_ms = self._consume(charge)
+            if retry_after_ms is None:
+                break
+            if attempt == self.client_retries:
+                error = CosmosHttpResponseError(status_code=429, message="Request rate is large")
+                error.headers = {"x-ms-retry-after-ms": str(retry_after_ms)}
+                raise error
+            time.sleep(retry_after_ms / 1000)
+        headers = {"x-ms-request-charge": str(charge)}
+        self.client_connection.last_response_headers = headers
+        if response_hook:
+            response_hook(headers, result)
+
+    def _consume(self, charge: float) -> int:
+        """
+        Records a request and takes its charge from the provisioned throughput.
+
+        Returns:
+        None if the request is allowed, otherwise the milliseconds to wait before retrying it
+        """
+        with self._lock:
+            self.stats["requests"] = self.stats["requests"] + 1
+            if self.throughput:
+                now = time.monotonic()
+                self._available_charge = min(self.throughput, self._available_charge + (now - self._last_refill) * self.throughput)
+                self._last_refill = now
+                if self._available_charge < charge:
+                    self.stats["throttled"] = self.stats["throttled"] + 1
+                    return math.ceil((charge - self._available_charge) / self.throughput * 1000)
+                self._available_charge = self._available_charge - charge
+            self.stats["requestCharge"] = self.stats["requestCharge"] + charge
+            return None
+
+
+class LocalItemPaged:
+    """
+    Stand-in for azure.core.paging.ItemPaged over a LocalCosmosContainer.
+    Continuation tokens are offsets into the container.
+    """
+
+    def __init__(self, container: LocalCosmosContainer, transform, page_size: int = None):
+        self._container = container
+        self._transform = transform
+        self._page_size = page_size or DEFAULT_PAGE_SIZE
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+    def by_page(self, continuation_token: str = None) -> "LocalPageIterator":
+        return LocalPageIterator(self._container, self._transform, self._page_size, continuation_token)
+
+
+class LocalPageIterator:
+
+    def __init__(self, container: LocalCosmosContainer, transform, page_size: int, continuation_token: str = None):
+        self._container = container
+        self._transform = transform
+        self._page_size = page_size
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        offset = int(self.continuation_token or 0)
+        while offset is not None:
+            page, offset = self._container._fetch_page(self._transform, offset, self._page_size)
+            self.continuation_token = str(offset) if offset is not None else None
+            yield page
+
+
+class LocalBlobContainer:
+    """
+    Dict backed stand-in for an azure-storage-blob ContainerClient.
+    Containers are shared by connection string and name so data outlives the BlobService that wrote it.
+    """
+
+    _containers = {}
+    _containers_lock = threading.Lock()
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.blobs = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @classmethod
+    def from_connection_string(cls, connection_string: str, container_name: str) -> "LocalBlobContainer":
+        with cls._containers_lock:
+            container = cls._containers.get((connection_string, container_name))
+            if container is None:
+                settings = parse_connection_string(connection_string)
+                container = cls(latency=float(settings.get("Latency", 0)))
+                cls._containers[(connection_string, container_name)] = container
+            return container
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": 0, "throttled": 0, "requestCharge": 0.0, "uploadedBytes": 0}
+
+    def upload_blob(self, name: str, data, overwrite: bool = False, metadata: dict = None, **kwargs):
+        if not isinstance(data, (bytes, str)):
+            data = b"".join(chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in data)
+        elif isinstance(data, str):
+            data = data.encode("utf-8")
+        self._request()
+        with self._lock:
+            if name in self.blobs and not overwrite:
+                raise Exception(f"Blob {name} already exists")
+            self.blobs[name] = {"data": data, "metadata": dict(metadata or {})}
+            self.stats["uploadedBytes"] = self.stats["uploadedBytes"] + len(data)
+
+    def get_blob_client(self, name: str) -> "LocalBlobClient":
+        return LocalBlobClient(self, name)
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.stats["requests"] = self.stats["requests"] + 1
+
+
+class LocalBlobClient:
+
+    def __init__(self, container: LocalBlobContainer, name: str):
+        self._container = container
+        self.name = name
+
+    def get_blob_properties(self):
+        self._container._request()
+        blob = self._container.blobs.get(self.name)
+        if blob is None:
+            raise ResourceNotFoundError(f"Blob {self.name} not found")
+        return SimpleNamespace(name=self.name, size=len(blob["data"]), metadata=dict(blob["metadata"]))
+
+    def set_blob_metadata(self, metadata: dict):
+        self._container._request()
+        blob = self._container.blobs.get(self.name)
+        if blob is None:
+            raise ResourceNotFoundError(f"Blob {self.name} not found")
+        blob["metadata"] = dict(metadata or {})
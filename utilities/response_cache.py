@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from utilities import logger
+import utilities.constants as constants
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for library api responses.
+
+    Entries are stored as json files named after the sha256 of the requested href.
+    Entries older than ttl seconds are treated as missing. When the total size of the
+    cache exceeds max_size bytes the least recently used entries are evicted.
+    In offline mode the caller is expected to never go to the network on a cache miss.
+    """
+
+    def __init__(self, directory: str, ttl: int = None, max_size: int = None, offline: bool = False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # Entry sizes keyed by path, least recently used first, so eviction does not scan the directory
+        self._entries = OrderedDict(
+            (path, size) for _, size, path in sorted(
+                (os.path.getmtime(path), os.path.getsize(path), path) for path in self._entry_paths()
+            )
+        )
+        self._size = sum(self._entries.values())
+
+    @staticmethod
+    def build_from_environment(directory: str = None, ttl: int = None, max_size: int = None, offline: bool = False) -> "ResponseCache":
+        """
+        Creates a cache from environment variables, returns None if no cache directory is configured.
+        Values passed as arguments take precedence over the environment variables.
+        """
+        directory = directory or os.environ.get(constants.LIBRARY_CACHE_DIRECTORY)
+        if not directory:
+            return None
+        if ttl is None and os.environ.get(constants.LIBRARY_CACHE_TTL):
+            ttl = int(os.environ.get(constants.LIBRARY_CACHE_TTL))
+        if max_size is None and os.environ.get(constants.LIBRARY_CACHE_MAX_SIZE):
+            max_size = int(os.environ.get(constants.LIBRARY_CACHE_MAX_SIZE))
+        offline = offline or os.environ.get(constants.LIBRARY_CACHE_OFFLINE, "").lower() in ["1", "true", "yes"]
+        return ResponseCache(directory, ttl=ttl, max_size=max_size, offline=offline)
+
+    def get(self, href: str):
+        """ Returns the cached response for href or None if it is missing or expired. """
+        path = self._get_path(href)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - entry.get("storedAt", 0) > self.ttl:
+            logger.debug(f"CACHE: Expired entry for {href}")
+            return None
+        try:
+            # Bump modification time so a new cache over the directory keeps the least recently used order
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        return entry.get("data")
+
+    def set(self, href: str, data):
+        """ Stores a response for href, evicting old entries if the cache is over its size limit. """
+        path = self._get_path(href)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = json.dumps({"href": href, "storedAt": time.time(), "data": data})
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(entry)
+        with self._lock:
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+            self._size = self._size - self._entries.pop(path, 0) + size
+            self._entries[path] = size
+            if self.max_size is not None and self._size > self.max_size:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path in self._entry_paths():
+                os.remove(path)
+            self._entries.clear()
+            self._size = 0
+
+    def _evict(self):
+        while self._entries and self._size > self.max_size:
+            path, size = self._entries.popitem(last=False)
+            self._size = self._size - size
+            try:
+                os.remove(path)
+                logger.debug(f"CACHE: Evicted {path}")
+            except OSError:
+                pass
+
+    def _entry_paths(self):
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                if file_name.endswith(".json"):
+                    yield os.path.join(root, file_name)
+
+    def _get_path(self, href: str) -> str:
+        key = sha256(href.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key[:2], f"{key}.json")
@@ -1,23 +1,89 @@
 import requests
 import json
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from utilities import logger
 from bs4 import BeautifulSoup
 
+DEFAULT_POOL_SIZE = 16
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 120)
+
 class WikiClient:
     
-    def __init__(self, username: str, password: str, spec_doc_id: str = None):
+    def __init__(self, username: str, password: str, spec_doc_id: str = None, pool_size: int = DEFAULT_POOL_SIZE, timeout = DEFAULT_TIMEOUT):
         self.username = username
         self.password = password
         self.spec_doc_id = spec_doc_id
+        self.timeout = timeout
+        self.session = self._create_session(pool_size)
+        self.pool_size = pool_size
+        # Shared by all paginated listings that prefetch their next page, created on first use
+        self._prefetch_executor: ThreadPoolExecutor = None
+        self._prefetch_executor_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._request_count = 0
+        self._request_seconds = 0.0
+        self._max_request_seconds = 0.0
         self.wiki_base_url = "https://wiki.cdisc.org"
         self.content_api_base_url = f"{self.wiki_base_url}/rest/api/content/"
         self.macros = {
             "summary": "35f2235a-e526-4b40-ad26-8161cd9defd7"
         }
 
+    def _create_session(self, pool_size: int) -> requests.Session:
+        # Puts are not retried since confluence rejects a repeated page version
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504, 408],
+            method_whitelist=["GET"],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=1, pool_maxsize=pool_size)
+        session = requests.Session()
+        session.auth = (self.username, self.password)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _request(self, method, url, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        try:
+            return self.session.request(method, url, timeout=self.timeout, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._metrics_lock:
+                self._request_count = self._request_count + 1
+                self._request_seconds = self._request_seconds + elapsed
+                self._max_request_seconds = max(self._max_request_seconds, elapsed)
+            logger.debug(f"WIKI: {method} {url} took {elapsed:.3f}s")
+
+    def get_request_metrics(self) -> dict:
+        """
+        Returns the number of requests made by this client and their latency in seconds.
+        """
+        with self._metrics_lock:
+            return {
+                "requests": self._request_count,
+                "totalSeconds": self._request_seconds,
+                "averageSeconds": self._request_seconds / self._request_count if self._request_count else 0.0,
+                "maxSeconds": self._max_request_seconds
+            }
+
     def get_wiki_json(self, document_id, doc_format = "view", path = ""):
         return self.get_json(self.content_api_base_url+f"{document_id}{path}?expand=body.{doc_format}")
 
+    def iter_wiki_results(self, document_id, doc_format = "view", path = "", prefetch = False, expand = None):
+        """
+        Lazily yields the results of a content listing. Additional properties to expand, such as metadata.labels, can be passed in expand.
+        """
+        expansions = ",".join([f"body.{doc_format}"] + (expand or []))
+        return self.iter_results(self.content_api_base_url+f"{document_id}{path}?expand={expansions}", prefetch)
+
     def get_page_labels(self, document_id):
         return self.get_json(self.content_api_base_url+f"{document_id}/label")
 
@@ -28,34 +94,72 @@ class WikiClient:
         return data.get("content")
 
     def get_html(self, url):
-        raw_data = requests.get(url, auth=(self.username, self.password))
+        raw_data = self._request("GET", url)
         if raw_data.status_code == 200:
             return raw_data.text
         else:
             raise Exception(f"Get request to {url} returned unsuccessful response {raw_data.status_code}")
     
     def get_json(self, url):
-        raw_data = requests.get(url, auth=(self.username, self.password))
+        pages = self.iter_json_pages(url)
+        json_data = next(pages)
+        for page in pages:
+            json_data["results"].extend(page["results"])
+        return json_data
+
+    def iter_json_pages(self, url, prefetch = False):
+        """
+        Lazily yields each page of a paginated response by following _links.next.
+        If prefetch is set and there is a next page, it is requested on the client's prefetch executor
+        while the current page is being consumed.
+        """
+        json_data = self._get_json_page(url)
+        while json_data is not None:
+            next_url = self._get_next_url(json_data)
+            next_page = self._get_prefetch_executor().submit(self._get_json_page, next_url) if prefetch and next_url else None
+            yield json_data
+            if next_page:
+                json_data = next_page.result()
+            else:
+                json_data = self._get_json_page(next_url) if next_url else None
+
+    def _get_prefetch_executor(self) -> ThreadPoolExecutor:
+        with self._prefetch_executor_lock:
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=self.pool_size)
+            return self._prefetch_executor
+
+    def iter_results(self, url, prefetch = False):
+        """
+        Lazily yields the results of every page of a paginated response.
+        """
+        for page in self.iter_json_pages(url, prefetch):
+            yield from page.get("results", [])
+
+    def _get_json_page(self, url):
+        raw_data = self._request("GET", url)
         if raw_data.status_code == 200:
             if not raw_data.encoding:
                 raw_data.encoding = 'UTF-8'
-            json_data = json.loads(raw_data.text)
-            next = json_data["_links"].get("next")
-            if next:
-                base = json_data["_links"].get("base")
-                json_data["results"].extend(self.get_json(f"{base}{next}")["results"])
-            return json_data
+            return json.loads(raw_data.text)
         else:
             raise Exception(f"Get request to {url} returned unsuccessful response {raw_data.status_code}")
+
+    def _get_next_url(self, json_data):
+        links = json_data.get("_links", {})
+        next = links.get("next")
+        if next:
+            return f"{links.get('base')}{next}"
+        return None
     
     def put_json(self, url, data):
-        raw_data = requests.put(url, data, auth=(self.username, self.password), headers={"Content-Type": "application/json"})
+        raw_data = self._request("PUT", url, data=data, headers={"Content-Type": "application/json"})
         if raw_data.status_code != 200:
             raise Exception(f"Put request to {url} returned unsuccessful response {raw_data.status_code}")
         
     def get_wiki_table(self, document_id, table_name):
         base_url = f"{self.wiki_base_url}/ajax/confiforms/rest/filter.action?pageId={document_id}&f={table_name}&q="
-        response = requests.get(base_url, auth=(self.username, self.password))
+        response = self._request("GET", base_url)
         if response.status_code != 200:
             raise Exception(f"Invalid url for wiki document {document_id} and table {table_name}")
         return json.loads(response.text)
@@ -104,7 +208,7 @@ class WikiClient:
 
     def download_file(self, file_path):
         url = f"{self.wiki_base_url}{file_path}"
-        raw_data = requests.get(url, auth=(self.username, self.password))
+        raw_data = self._request("GET", url)
         if raw_data.status_code == 200:
             return raw_data.content
         else:
@@ -8,84 +8,205 @@ from logging import Logger, getLogger
 from utilities.blob_service import BlobService
 from utilities import document_tags
 from typing import List
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import heapq
 import os
+import time
+import threading
 from sys import maxsize
-from urllib.parse import unquote
+from urllib.parse import unquote, urlparse, parse_qs
+from hashlib import sha256
 from re import compile
 
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_IMAGE_WORKERS = 8
+PROGRESS_LOG_INTERVAL = 100
+
 class Parser:
     
-    def __init__(self, client, logger=None):
+    def __init__(self, client, logger=None, max_workers=DEFAULT_MAX_WORKERS, image_workers=DEFAULT_IMAGE_WORKERS):
         self.client: WikiClient = client
-        self.image_blob_service: BlobService = BlobService("images")
+        self.max_workers = max_workers
+        self.image_blob_service: BlobService = BlobService("images", max_concurrency=image_workers)
         self.logger: Logger = logger or getLogger("wiki-parser")
         self.transformer = Transformer()
+        # Child listings fetched ahead of time, keyed by page id
+        self._page_children = {}
+        # Documents from the previous load keyed by page id
+        self._existing_documents = {}
+        self._incremental = False
+        self.unchanged_document_ids = set()
+        self._image_executor = ThreadPoolExecutor(max_workers=image_workers)
+        self._image_stats_lock = threading.Lock()
+        self.image_stats = {
+            "uploaded": 0,
+            "skipped": 0,
+            "downloadedBytes": 0,
+            "uploadedBytes": 0
+        }
     
     def get_markdown(self, url):
         html = self.client.get_html(url)
         return self._get_markdown_from_html(html)
     
-    def get_ig_document_tree(self, url, standard, standard_version, max_pages=maxsize):
-        page_id = self._get_page_id(url)
-        children = self._get_page_children(page_id)
-        pages = [
-            {
-                "id": str(uuid4()),
-                "title": self._clean_title(child["title"]),
-                "page_data": child
-            } for child in children if self._has_children(child["id"])
-        ]
-        documents = {}
-        while pages and len(documents) < max_pages:
-            page = pages.pop()
-            title = page.get("title")
-            if "specifications" in title.lower() or "content control" in title.lower():
-                continue
-            page_data = page["page_data"]
-            children = self._get_page_children(page_data["id"])
-            html = page_data["body"]["view"]["value"]
-            markdown_data = self._html_to_markdown(html)
-            parsed_html = self._parse_html(html, page_data["id"])
-            labels = self._get_labels(page_data["id"])
-            tags = self._parse_labels(labels)
-            if "specifications" in tags.get("sections", []):
-                # Ignore specification tables since they are already in the CDISC library
-                continue
-            doc_params = {
-                "id": page["id"],
-                "pageId": page_data["id"],
-                "standard": standard,
-                "version": standard_version,
-                "title": title,
-                "html": parsed_html,
-                "text": markdown_data,
-                "parent": page.get("parent"),
-                "parentDocumentTitle": page.get("parentDocumentTitle"),
-                "section": next(iter(tags.get("sections", [])), "publication"),
-                "structures": tags.get("structures"),
-                "useCase": next(iter(tags.get("use_cases", [])), None),
-            }
+    def get_ig_document_tree(self, url, standard, standard_version, max_pages=maxsize, incremental=False):
+        """
+        Crawls the page tree below url.
+        Pages are processed concurrently from a work queue and documents are returned breadth first,
+        with parents before their children, in the order the pages appear in confluence.
 
-            if tags.get("integrated_standards"):
-                doc_params["standardSubtype"] = tags["integrated_standards"][0]
-            document = IGDocument.get_or_create(doc_params)
-            new_child_documents = [
+        In incremental mode pages whose confluence version, title, labels, parent and children are unchanged
+        since the last load are not parsed again. Their ids are added to unchanged_document_ids.
+        """
+        start = time.perf_counter()
+        self.unchanged_document_ids = set()
+        self._incremental = incremental
+        self._existing_documents = IGDocument.load_page_index(standard, standard_version)
+        page_id = self._get_page_id(url)
+        children = list(self._iter_page_children(page_id))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            has_children = list(executor.map(lambda child: self._has_children(child["id"]), children))
+            pages = [
                 {
-                    "id": str(uuid4()),
+                    "id": self._get_document_id(child["id"]),
                     "title": self._clean_title(child["title"]),
-                    "page_data": child,
-                    "parent": document.id,
-                    "parentDocumentTitle": document.title
-                } for child in children
+                    "page_data": child
+                } for child, child_has_children in zip(children, has_children) if child_has_children
             ]
+            documents_by_position = self._crawl(executor, pages, standard, standard_version, max_pages, start)
+        # Positions are the child indexes from the top of the tree, so sorting by depth and then position
+        # returns parents before their children in the order the pages appear in confluence
+        documents = {
+            document.id: document
+            for _, document in sorted(documents_by_position.items(), key=lambda item: (len(item[0]), item[0]))
+        }
+        self._page_children.clear()
+        self._existing_documents = {}
+        IGDocument.clear_page_index(standard, standard_version)
+        elapsed = time.perf_counter() - start
+        self.logger.info(f"Finished crawling {len(documents)} documents in {elapsed:.2f}s ({len(documents) / elapsed:.2f} pages/sec)")
+        if incremental:
+            self.logger.info(f"{len(self.unchanged_document_ids)} of {len(documents)} documents unchanged since the last load")
+        self.logger.info(
+            f"Images: {self.image_stats['uploaded']} uploaded, {self.image_stats['skipped']} unchanged, "
+            f"{self.image_stats['downloadedBytes']} bytes downloaded, {self.image_stats['uploadedBytes']} bytes uploaded"
+        )
+        return documents
 
-            for child in new_child_documents:
-                document.add_child(child.get("id"), child.get("title"))
-            self.logger.debug(f"{document.title} found with children {[child['title'] for child in new_child_documents]}")
-            documents[document.id] = document
-            pages = pages + new_child_documents
+    def _crawl(self, executor: ThreadPoolExecutor, pages: List[dict], standard, standard_version, max_pages, start) -> dict:
+        """
+        Processes pages from a work queue. The children of a page are queued as soon as it is processed,
+        so a slow page only delays its own subtree. Queued pages are started shallowest first, and at most
+        max_pages documents are built. Pages that are skipped free their place for the next queued page.
+
+        Returns:
+        The documents keyed by their position in the page tree
+        """
+        queue = []
+        for index, page in enumerate(pages):
+            heapq.heappush(queue, (1, (index,), page))
+        in_flight = {}
+        documents = {}
+        next_progress_log = PROGRESS_LOG_INTERVAL
+        while queue or in_flight:
+            while queue and len(in_flight) < self.max_workers and len(documents) + len(in_flight) < max_pages:
+                _, position, page = heapq.heappop(queue)
+                in_flight[executor.submit(self._process_page, page, standard, standard_version)] = position
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = in_flight.pop(future)
+                result = future.result()
+                if not result:
+                    continue
+                document, new_child_documents = result
+                documents[position] = document
+                for index, child in enumerate(new_child_documents):
+                    heapq.heappush(queue, (len(position) + 1, position + (index,), child))
+            if len(documents) >= next_progress_log:
+                elapsed = time.perf_counter() - start
+                self.logger.info(f"Processed {len(documents)} documents at {len(documents) / elapsed:.2f} pages/sec")
+                next_progress_log = next_progress_log + PROGRESS_LOG_INTERVAL
         return documents
 
+    def _process_page(self, page, standard, standard_version):
+        """
+        Builds the document for a single page.
+
+        Returns:
+        The document and the pages of its children, or None if the page is ignored
+        """
+        title = page.get("title")
+        if "specifications" in title.lower() or "content control" in title.lower():
+            return None
+        page_data = page["page_data"]
+        children = self._take_page_children(page_data["id"])
+        labels = self._get_labels(page_data)
+        tags = self._parse_labels(labels)
+        if "specifications" in tags.get("sections", []):
+            # Ignore specification tables since they are already in the CDISC library
+            return None
+        doc_params = {
+            "id": page["id"],
+            "pageId": page_data["id"],
+            "pageVersion": page_data.get("version", {}).get("number"),
+            "standard": standard,
+            "version": standard_version,
+            "title": title,
+            "parent": page.get("parent"),
+            "parentDocumentTitle": page.get("parentDocumentTitle"),
+            "section": next(iter(tags.get("sections", [])), "publication"),
+            "structures": tags.get("structures"),
+            "useCase": next(iter(tags.get("use_cases", [])), None),
+        }
+
+        if tags.get("integrated_standards"):
+            doc_params["standardSubtype"] = tags["integrated_standards"][0]
+        child_ids = [self._get_document_id(child["id"]) for child in children]
+        child_titles = [self._clean_title(child["title"]) for child in children]
+        existing_document = self._existing_documents.get(page_data["id"])
+        if self._incremental and existing_document and self._is_unchanged(existing_document, doc_params, child_ids, child_titles):
+            # The page index only holds a projection of the stored document, so the unchanged document is
+            # rebuilt from the page data. Its html and text are not loaded and it is not saved again
+            document = IGDocument({**doc_params, "id": existing_document["id"], "createdAt": existing_document.get("createdAt")})
+            self.unchanged_document_ids.add(document.id)
+        else:
+            html = page_data["body"]["view"]["value"]
+            doc_params["text"] = self._html_to_markdown(html)
+            doc_params["html"] = self._parse_html(html, page_data["id"])
+            document = IGDocument.get_or_create(doc_params)
+        new_child_documents = [
+            {
+                "id": child_id,
+                "title": child_title,
+                "page_data": child,
+                "parent": document.id,
+                "parentDocumentTitle": document.title
+            } for child_id, child_title, child in zip(child_ids, child_titles, children)
+        ]
+
+        for child in new_child_documents:
+            document.add_child(child.get("id"), child.get("title"))
+        self.logger.debug(f"{document.title} found with children {[child['title'] for child in new_child_documents]}")
+        return document, new_child_documents
+
+    def _get_document_id(self, page_id) -> str:
+        """
+        Returns the id of the existing document for a page so that parent and child references stay stable between loads.
+        """
+        existing_document = self._existing_documents.get(page_id)
+        return existing_document["id"] if existing_document else str(uuid4())
+
+    def _is_unchanged(self, existing_document: dict, doc_params: dict, child_ids: List[str], child_titles: List[str]) -> bool:
+        if doc_params["pageVersion"] is None or existing_document.get("pageVersion") != doc_params["pageVersion"]:
+            return False
+        if existing_document.get("children", []) != child_ids or existing_document.get("childrenTitles", []) != child_titles:
+            return False
+        compared_keys = ["title", "parent", "parentDocumentTitle", "section", "structures", "useCase", "standardSubtype"]
+        # Empty values are not stored, so they are treated as equal to missing ones
+        return all((existing_document.get(key) or None) == (doc_params.get(key) or None) for key in compared_keys)
+
     def _parse_labels(self, labels: List[str]) -> dict:
         """
         Returns a dictionary mapping label type to label value
@@ -139,29 +260,99 @@ class Parser:
         for a in parser.find_all("a"):
             # Replace links with plaintext
             a.unwrap()
-        for img in parser.find_all("img"):
-            img_link = img.attrs["src"]
-            try:
-                data = self.client.download_file(img_link)
-                image_path = img_link.split("?")[0]
-                image_file_name = f"{page_id}-{image_path.split('/')[-1]}"
-                self.image_blob_service.upload_file(data, unquote(image_file_name))
-                base_url = f"https://cdisclibrary{os.environ.get('ENVIRONMENT', '').lower()}.blob.core.windows.net/images"
-                image_link_path = f"{base_url}/{image_file_name}"
-                attrs = {
-                    "width": img.attrs.get("width", 500),
-                    "src": image_link_path
-                }
-                if "height" in img.attrs:
-                    attrs["height"] = img.attrs["height"]
-                img.attrs = attrs
-                self.logger.info(f"Successfully duplicated {img_link}")
-            except Exception as e:
-                self.logger.error(f"Failed to duplicate {img_link}")
-                self.logger.error(e)
+        images = parser.find_all("img")
+        synced_images = list(self._image_executor.map(lambda img: self._sync_image(img.attrs["src"], page_id), images))
+        failed_uploads = self._upload_images([upload for _, upload in synced_images if upload])
+        for img, (image_link_path, upload) in zip(images, synced_images):
+            if not image_link_path or (upload and upload[0] in failed_uploads):
+                continue
+            attrs = {
+                "width": img.attrs.get("width", 500),
+                "src": image_link_path
+            }
+            if "height" in img.attrs:
+                attrs["height"] = img.attrs["height"]
+            img.attrs = attrs
         return self.transformer.get_raw_text(str(parser))
         
 
+    def _sync_image(self, img_link, page_id) -> (str, tuple):
+        """
+        Prepares the copy of an image from the wiki to blob storage.
+        The download is skipped if the blob was copied from the same attachment version,
+        and the upload is skipped if the blob already has identical content.
+
+        Returns:
+        The blob url of the image, or None if the image could not be copied,
+        and the (blob_name, data, metadata) upload still to be made, or None if the blob is up to date
+        """
+        try:
+            image_path = img_link.split("?")[0]
+            image_file_name = f"{page_id}-{image_path.split('/')[-1]}"
+            base_url = f"https://cdisclibrary{os.environ.get('ENVIRONMENT', '').lower()}.blob.core.windows.net/images"
+            image_link_path = f"{base_url}/{image_file_name}"
+            blob_name = unquote(image_file_name)
+            source_version = self._get_attachment_version(img_link)
+            metadata = self.image_blob_service.get_blob_metadata(blob_name)
+            if metadata is not None and source_version and metadata.get("source_version") == source_version:
+                self._record_image_transfer(skipped=True)
+                self.logger.debug(f"Skipping unchanged image {img_link}")
+                return image_link_path, None
+            data = self.client.download_file(img_link)
+            content_hash = sha256(data).hexdigest()
+            new_metadata = {"content_hash": content_hash}
+            if source_version:
+                new_metadata["source_version"] = source_version
+            if metadata is not None and metadata.get("content_hash") == content_hash:
+                self.image_blob_service.set_blob_metadata(blob_name, new_metadata)
+                self._record_image_transfer(downloaded=len(data), skipped=True)
+                self.logger.debug(f"Skipping upload of identical image {img_link}")
+                return image_link_path, None
+            self._record_image_transfer(downloaded=len(data))
+            return image_link_path, (blob_name, data, new_metadata)
+        except Exception as e:
+            self.logger.error(f"Failed to duplicate {img_link}")
+            self.logger.error(e)
+            return None, None
+
+    def _upload_images(self, uploads: [tuple]) -> set:
+        """
+        Uploads the images of a page on the shared image executor, so the uploads of all crawler workers
+        together stay within the connection pool of the blob container client.
+
+        Returns:
+        The names of the blobs that failed to upload
+        """
+        if not uploads:
+            return set()
+        upload_stats = self.image_blob_service.upload_many(uploads, executor=self._image_executor)
+        failed_uploads = set(upload_stats["failed"])
+        for blob_name, data, _ in uploads:
+            if blob_name not in failed_uploads:
+                self._record_image_transfer(uploaded=len(data))
+                self.logger.info(f"Successfully duplicated {blob_name}")
+        return failed_uploads
+
+    def _get_attachment_version(self, img_link) -> str:
+        """
+        Returns an identifier for the attachment version from the version and modificationDate query parameters of an image link.
+        """
+        query = parse_qs(urlparse(img_link).query)
+        version = next(iter(query.get("version", [])), None)
+        modification_date = next(iter(query.get("modificationDate", [])), None)
+        if not version and not modification_date:
+            return None
+        return f"{version}-{modification_date}"
+
+    def _record_image_transfer(self, downloaded=0, uploaded=0, skipped=False):
+        with self._image_stats_lock:
+            self.image_stats["downloadedBytes"] = self.image_stats["downloadedBytes"] + downloaded
+            self.image_stats["uploadedBytes"] = self.image_stats["uploadedBytes"] + uploaded
+            if uploaded:
+                self.image_stats["uploaded"] = self.image_stats["uploaded"] + 1
+            if skipped:
+                self.image_stats["skipped"] = self.image_stats["skipped"] + 1
+
     def _get_markdown_from_html(self, html):
         parser = BeautifulSoup(html, 'html.parser')
         data = parser.find("div", {"id": "main-content"})
@@ -177,23 +368,46 @@ class Parser:
         data = parser.find("meta", {"name": "ajs-page-id"})
         return data.get("content")
     
-    def _get_labels(self, page_id):
-        labels_data = self.client.get_page_labels(page_id)
+    def _get_labels(self, page_data):
+        """
+        Returns the label names of a page.
+        Labels are read from the expanded page data and only requested separately if they are missing or truncated.
+        """
+        labels_data = page_data.get("metadata", {}).get("labels")
+        if labels_data is None or labels_data.get("_links", {}).get("next"):
+            labels_data = self.client.get_page_labels(page_data["id"])
         return [label["name"] for label in labels_data.get("results", [])]
   
     def _get_page_children(self, page_id):
-        child_data = self._try_get_child_data(page_id)
-        return child_data.get("results")
+        """
+        Returns the children of a page. The listing is memoized so it is only requested once per page.
+        """
+        if page_id not in self._page_children:
+            self._page_children[page_id] = list(self._iter_page_children(page_id))
+        return self._page_children[page_id]
+
+    def _take_page_children(self, page_id):
+        """
+        Returns the children of a page and releases the memoized listing.
+        """
+        children = self._get_page_children(page_id)
+        del self._page_children[page_id]
+        return children
+
+    def _iter_page_children(self, page_id, prefetch=True):
+        """
+        Lazily yields the children of a page.
+        If prefetch is set the next page of results is fetched while the current one is processed.
+        """
+        try:
+            yield from self.client.iter_wiki_results(page_id, path="/child/page", prefetch=prefetch, expand=["metadata.labels", "version"])
+        except Exception as e:
+            self.logger.error(f"Failed to get children for page {page_id}")
+            self.logger.error(e)
     
     def _get_title_markdown(self, title):
         return f"{title}\n--------------\n\n"
     
-    def _try_get_child_data(self, page_id):
-        try:
-            return self.client.get_wiki_json(page_id, path="/child/page")
-        except:
-            return {}
-        
     def _clean_title(self, title):
         example_regex = compile(r'.*Example\.\s*')
         return example_regex.sub('', title, 1)